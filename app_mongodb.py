@@ -11,6 +11,7 @@ from pymongo.errors import ConnectionFailure, DuplicateKeyError
 from bson import ObjectId
 from bson.errors import InvalidId
 from functools import wraps
+from thumbnails import init_thumbnails
 
 # Load environment variables at the top
 try:
@@ -54,6 +55,9 @@ mongo_db = None
 # Ensure uploads directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Serve listing-page thumbnails from uploads/thumbnails
+init_thumbnails(app)
+
 def init_mongodb():
     """Initialize MongoDB connection"""
     global mongo_client, mongo_db
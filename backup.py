@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Streaming backup and restore for Quiz Partner
+Exports modules and questions from either backend as JSON Lines and imports
+them back with batched inserts. Files ending in .gz or .zst are compressed
+(zstd needs the optional `zstandard` package).
+
+Every line is one JSON object with a "type":
+  header     format version, source backend and image mode
+  module     id, name, created_at
+  image      name, sha256, size and base64 data (only with --images bundle)
+  question   id, module_id, name, image_path, image_sha256, image_size,
+             answer, created_at, updated_at
+
+Module and question ids are the source backend's own ids and are only used
+to link questions to modules; imports assign new ids. Image lines are written
+just before the first question that uses them.
+"""
+
+import io
+import os
+import sys
+import gzip
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from repository import build_search_terms
+from upload_storage import CONTENT_HASH_PATTERN, file_sha256
+
+# Configuration
+UPLOAD_FOLDER = 'uploads'
+SQLITE_PATH = 'Crime_platform.db'
+MONGODB_URI = os.environ.get('MONGODB_URI')
+DATABASE_NAME = os.environ.get('DATABASE_NAME', 'portal-db')
+BACKUP_FORMAT = 'quiz-partner-backup'
+BACKUP_VERSION = 1
+DEFAULT_BATCH_SIZE = 1000
+DUPLICATE_KEY_ERROR = 11000
+
+# ---------------------------------------------------------------------------
+# Stream helpers
+# ---------------------------------------------------------------------------
+
+def open_backup(path, mode):
+    """Open a backup file for text reading ('r') or writing ('w'), compressed by extension."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("❌ .zst backups need the zstandard package: pip install zstandard")
+        raw = open(path, mode + 'b')
+        if mode == 'w':
+            stream = zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def write_record(out, record_type, **fields):
+    out.write(json.dumps({'type': record_type, **fields}, ensure_ascii=False))
+    out.write('\n')
+
+def image_sha256(upload_folder, filename):
+    """Checksum of an upload; content-addressed names already are their checksum."""
+    stem = filename.rsplit('.', 1)[0]
+    if CONTENT_HASH_PATTERN.match(stem):
+        return stem
+    file_path = os.path.join(upload_folder, filename)
+    return file_sha256(file_path) if os.path.isfile(file_path) else None
+
+def report_done(label, counts, started_at):
+    elapsed = max(time.monotonic() - started_at, 1e-6)
+    rows = counts['modules'] + counts['questions']
+    print(f"✅ {label} {counts['modules']} modules, {counts['questions']} questions, "
+          f"{counts['images']} images in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+    if counts.get('missing_images'):
+        print(f"⚠️ {counts['missing_images']} referenced images were not found in the uploads folder")
+    if counts.get('orphaned_questions'):
+        print(f"⚠️ Skipped {counts['orphaned_questions']} questions whose module is not in the backup")
+    if counts.get('duplicate_questions'):
+        print(f"⚠️ Skipped {counts['duplicate_questions']} questions that already exist")
+    if counts.get('failed_questions'):
+        print(f"❌ {counts['failed_questions']} questions could not be inserted")
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def sqlite_rows(sqlite_path, batch_size):
+    """Yield ('module'|'question', fields) from SQLite without loading whole tables."""
+    conn = sqlite3.connect(sqlite_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        question_columns = {row['name'] for row in conn.execute('PRAGMA table_info(questions)')}
+        optional = [column for column in ('image_size', 'updated_at') if column in question_columns]
+        queries = [
+            ('module', 'SELECT id, name, created_at FROM modules ORDER BY id'),
+            ('question', 'SELECT id, module_id, name, image_path, answer, created_at'
+                         + ''.join(f', {column}' for column in optional)
+                         + ' FROM questions ORDER BY id')
+        ]
+        for record_type, query in queries:
+            cursor = conn.execute(query)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield record_type, dict(row)
+    finally:
+        conn.close()
+
+def mongodb_rows(mongo_db, batch_size):
+    """Yield ('module'|'question', fields) from MongoDB with ids as strings."""
+    for module in mongo_db.modules.find({}, {'name': 1, 'created_at': 1}).sort('_id', 1).batch_size(batch_size):
+        yield 'module', {'id': str(module['_id']), 'name': module['name'], 'created_at': module.get('created_at')}
+
+    projection = {'module_id': 1, 'name': 1, 'image_path': 1, 'image_size': 1,
+                  'answer': 1, 'created_at': 1, 'updated_at': 1}
+    for question in mongo_db.questions.find({}, projection).sort('_id', 1).batch_size(batch_size):
+        question['id'] = str(question.pop('_id'))
+        question['module_id'] = str(question['module_id'])
+        yield 'question', question
+
+def export_backup(rows, output_path, source, images='reference', upload_folder=UPLOAD_FOLDER):
+    """Write rows from sqlite_rows()/mongodb_rows() to a JSONL backup."""
+    print(f"📤 Exporting {source} data to {output_path} (images: {images})...")
+    counts = {'modules': 0, 'questions': 0, 'images': 0, 'missing_images': 0}
+    bundled = set()
+    started_at = time.monotonic()
+
+    with open_backup(output_path, 'w') as out:
+        write_record(out, 'header', format=BACKUP_FORMAT, version=BACKUP_VERSION, source=source,
+                     images=images, exported_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+
+        for record_type, row in rows:
+            if record_type == 'module':
+                write_record(out, 'module', id=row['id'], name=row['name'], created_at=row['created_at'])
+                counts['modules'] += 1
+                continue
+
+            image_path = row['image_path']
+            file_path = os.path.join(upload_folder, image_path)
+            sha256 = image_sha256(upload_folder, image_path)
+            if not os.path.isfile(file_path):
+                counts['missing_images'] += 1
+            elif images == 'bundle' and image_path not in bundled:
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+                write_record(out, 'image', name=image_path, sha256=hashlib.sha256(data).hexdigest(),
+                             size=len(data), data=base64.b64encode(data).decode('ascii'))
+                bundled.add(image_path)
+                counts['images'] += 1
+
+            write_record(out, 'question', id=row['id'], module_id=row['module_id'], name=row['name'],
+                         image_path=image_path, image_sha256=sha256,
+                         image_size=row.get('image_size') or (os.path.getsize(file_path) if os.path.isfile(file_path) else 0),
+                         answer=row['answer'], created_at=row['created_at'], updated_at=row.get('updated_at'))
+            counts['questions'] += 1
+
+    report_done('Exported', counts, started_at)
+    return True
+
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+
+def read_records(input_path):
+    """Yield records from a backup, checking the header first."""
+    with open_backup(input_path, 'r') as stream:
+        header = json.loads(stream.readline() or '{}')
+        if header.get('format') != BACKUP_FORMAT or header.get('version') != BACKUP_VERSION:
+            raise SystemExit(f"❌ {input_path} is not a version {BACKUP_VERSION} Quiz Partner backup")
+        print(f"📋 Backup from {header['source']}, exported {header['exported_at']} (images: {header['images']})")
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+def restore_image(record, upload_folder):
+    """Write a bundled image unless it is already present; returns True if written."""
+    file_path = os.path.join(upload_folder, os.path.basename(record['name']))
+    if os.path.isfile(file_path) and file_sha256(file_path) == record['sha256']:
+        return False
+
+    data = base64.b64decode(record['data'])
+    if hashlib.sha256(data).hexdigest() != record['sha256']:
+        raise ValueError(f"checksum mismatch for bundled image {record['name']}")
+
+    # Write to a temporary name first so the app never serves a partial file
+    temp_path = os.path.join(upload_folder, f".{os.path.basename(record['name'])}.tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, file_path)
+    return True
+
+def check_image(record, upload_folder, checked):
+    """For referenced (not bundled) images, confirm the file is already in place."""
+    image_path = record['image_path']
+    if image_path in checked:
+        return True
+    checked.add(image_path)
+    file_path = os.path.join(upload_folder, image_path)
+    if not os.path.isfile(file_path):
+        return False
+    return record.get('image_sha256') in (None, image_sha256(upload_folder, image_path))
+
+class SQLiteImporter:
+    """Batched import into the SQLite schema used by app_sqlite_with_auth.py"""
+
+    def __init__(self, sqlite_path, replace):
+        self.conn = sqlite3.connect(sqlite_path)
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not {'modules', 'questions'} <= tables:
+            raise SystemExit(f"❌ {sqlite_path} has no Quiz Partner schema; start the SQLite app once to create it")
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        # Databases the app has not opened since these columns were added lack them
+        question_columns = {row[1] for row in self.conn.execute('PRAGMA table_info(questions)')}
+        self.optional_columns = [column for column in ('image_size', 'updated_at') if column in question_columns]
+        if replace:
+            self.conn.execute('DELETE FROM questions')
+            self.conn.execute('DELETE FROM modules')
+
+    def insert_modules(self, modules):
+        """Insert modules (merging by name) and return {backup id: new id}."""
+        self.conn.executemany('INSERT OR IGNORE INTO modules (name, created_at) VALUES (?, ?)',
+                              [(module['name'], module['created_at']) for module in modules])
+        placeholders = ','.join('?' * len(modules))
+        ids = dict(self.conn.execute(f'SELECT name, id FROM modules WHERE name IN ({placeholders})',
+                                     [module['name'] for module in modules]))
+        self.conn.commit()
+        return {module['id']: ids[module['name']] for module in modules}
+
+    def insert_questions(self, questions, module_ids):
+        """Insert questions; returns the write errors as {'duplicate': n, 'failed': n}."""
+        columns = ['module_id', 'name', 'image_path', 'answer', 'created_at'] + self.optional_columns
+        defaults = {'image_size': 0}
+        # Rows without a creation time get the column's default rather than NULL
+        placeholders = ['COALESCE(?, CURRENT_TIMESTAMP)' if column == 'created_at' else '?' for column in columns]
+        self.conn.executemany(
+            f"INSERT INTO questions ({', '.join(columns)}) VALUES ({', '.join(placeholders)})",
+            [
+                [module_ids[question['module_id']]]
+                + [question.get(column) or defaults.get(column) for column in columns[1:]]
+                for question in questions
+            ]
+        )
+        self.conn.commit()
+        return {'duplicate': 0, 'failed': 0}
+
+    def finish(self):
+        self.conn.close()
+
+class MongoImporter:
+    """Batched import into the MongoDB collections used by app.py"""
+
+    def __init__(self, mongo_db, replace):
+        self.db = mongo_db
+        self.stats = {}
+        if replace:
+            self.db.questions.delete_many({})
+            self.db.modules.delete_many({})
+
+    def insert_modules(self, modules):
+        """Insert modules (merging by name) and return {backup id: ObjectId}."""
+        ids = {module['name']: module['_id'] for module in
+               self.db.modules.find({'name': {'$in': [module['name'] for module in modules]}}, {'name': 1})}
+        new_docs = []
+        for module in modules:
+            if module['name'] not in ids:
+                ids[module['name']] = ObjectId()
+                new_docs.append({'_id': ids[module['name']], 'name': module['name'], 'created_at': module['created_at'],
+                                 'question_count': 0, 'image_bytes': 0})
+        if new_docs:
+            try:
+                self.db.modules.insert_many(new_docs, ordered=False)
+            except BulkWriteError as e:
+                # Modules created by the app meanwhile hit the unique name index; use their ids
+                errors = e.details.get('writeErrors', [])
+                if any(error['code'] != DUPLICATE_KEY_ERROR for error in errors):
+                    raise
+                names = [new_docs[error['index']]['name'] for error in errors]
+                ids.update((module['name'], module['_id']) for module in
+                           self.db.modules.find({'name': {'$in': names}}, {'name': 1}))
+        return {module['id']: ids[module['name']] for module in modules}
+
+    def insert_questions(self, questions, module_ids):
+        """Insert questions; returns the write errors as {'duplicate': n, 'failed': n}.
+
+        The unordered insert goes on past failed documents, which are left out
+        of the module counters.
+        """
+        docs = []
+        for question in questions:
+            module_id = module_ids[question['module_id']]
+            doc = {
+                'module_id': module_id,
+                'name': question['name'],
+                'image_path': question['image_path'],
+                'image_size': question.get('image_size') or 0,
+                'answer': question['answer'],
+                'search_terms': build_search_terms(question['name'], question['answer']),
+                'created_at': question.get('created_at') or datetime.utcnow().isoformat()
+            }
+            if question.get('updated_at'):
+                doc['updated_at'] = question['updated_at']
+            docs.append(doc)
+
+        errors = []
+        try:
+            self.db.questions.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            print(f"  ⚠️ {len(errors)} of {len(docs)} questions failed to insert ({errors[0]['errmsg'] if errors else e})")
+        failed = {error['index'] for error in errors}
+
+        # Accumulate the denormalized module counters the dashboard reads
+        for index, doc in enumerate(docs):
+            if index in failed:
+                continue
+            count, size, last = self.stats.get(doc['module_id'], (0, 0, ''))
+            changed = doc.get('updated_at') or doc['created_at'] or ''
+            self.stats[doc['module_id']] = (count + 1, size + doc['image_size'], max(last, changed))
+
+        duplicates = sum(1 for error in errors if error['code'] == DUPLICATE_KEY_ERROR)
+        return {'duplicate': duplicates, 'failed': len(errors) - duplicates}
+
+    def finish(self):
+        operations = [
+            UpdateOne({'_id': module_id}, {
+                '$inc': {'question_count': count, 'image_bytes': size},
+                '$max': {'last_updated': last}
+            })
+            for module_id, (count, size, last) in self.stats.items()
+        ]
+        if operations:
+            self.db.modules.bulk_write(operations, ordered=False)
+
+def import_backup(records, importer, batch_size=DEFAULT_BATCH_SIZE, upload_folder=UPLOAD_FOLDER):
+    """Feed backup records to an importer in batches of batch_size."""
+    counts = {'modules': 0, 'questions': 0, 'images': 0, 'missing_images': 0, 'orphaned_questions': 0,
+              'duplicate_questions': 0, 'failed_questions': 0}
+    module_ids = {}
+    modules, questions = [], []
+    checked_images = set()
+    started_at = time.monotonic()
+    os.makedirs(upload_folder, exist_ok=True)
+
+    def flush_modules():
+        if modules:
+            module_ids.update(importer.insert_modules(modules))
+            counts['modules'] += len(modules)
+            modules.clear()
+
+    def flush_questions():
+        if questions:
+            flush_modules()
+            # Rows left behind by a deleted module have nothing to attach to
+            linked = [question for question in questions if question['module_id'] in module_ids]
+            counts['orphaned_questions'] += len(questions) - len(linked)
+            errors = importer.insert_questions(linked, module_ids) if linked else {'duplicate': 0, 'failed': 0}
+            counts['duplicate_questions'] += errors['duplicate']
+            counts['failed_questions'] += errors['failed']
+            counts['questions'] += len(linked) - errors['duplicate'] - errors['failed']
+            questions.clear()
+            print(f"  📝 {counts['questions']} questions imported...")
+
+    for record in records:
+        record_type = record['type']
+        if record_type == 'module':
+            modules.append(record)
+            if len(modules) >= batch_size:
+                flush_modules()
+        elif record_type == 'image':
+            if restore_image(record, upload_folder):
+                counts['images'] += 1
+            checked_images.add(record['name'])
+        elif record_type == 'question':
+            if not check_image(record, upload_folder, checked_images):
+                counts['missing_images'] += 1
+            questions.append(record)
+            if len(questions) >= batch_size:
+                flush_questions()
+
+    flush_modules()
+    flush_questions()
+    importer.finish()
+
+    report_done('Imported', counts, started_at)
+    return counts['failed_questions'] == 0
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+
+def connect_mongodb(uri, database_name):
+    if not uri:
+        raise SystemExit("❌ MongoDB URI is required (--mongodb-uri or MONGODB_URI)")
+    client = MongoClient(uri, serverSelectionTimeoutMS=10000)
+    client.admin.command('ping')
+    return client[database_name]
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream Quiz Partner modules and questions to or from a JSONL backup')
+    parser.add_argument('command', choices=['export', 'import'], help='Direction of the transfer')
+    parser.add_argument('path', help='Backup file; .gz and .zst are compressed')
+    parser.add_argument('--backend', choices=['sqlite', 'mongodb'], default='sqlite', help='Database to read from or write to (default: sqlite)')
+    parser.add_argument('--sqlite-path', default=SQLITE_PATH, help=f'SQLite database (default: {SQLITE_PATH})')
+    parser.add_argument('--mongodb-uri', default=MONGODB_URI, help='MongoDB connection string (default: $MONGODB_URI)')
+    parser.add_argument('--database-name', default=DATABASE_NAME, help=f'MongoDB database name (default: {DATABASE_NAME})')
+    parser.add_argument('--uploads', default=UPLOAD_FOLDER, help='Uploads directory (default: uploads)')
+    parser.add_argument('--images', choices=['reference', 'bundle'], default='reference',
+                        help='Export: reference images by name and SHA-256, or bundle their bytes into the backup')
+    parser.add_argument('--replace', action='store_true', help='Import: delete existing modules and questions first')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help=f'Rows per read/insert batch (default: {DEFAULT_BATCH_SIZE})')
+
+    args = parser.parse_args()
+
+    print("💾 Quiz Partner - Backup")
+    print("=" * 60)
+
+    if args.command == 'export':
+        if args.backend == 'sqlite':
+            rows = sqlite_rows(args.sqlite_path, args.batch_size)
+        else:
+            rows = mongodb_rows(connect_mongodb(args.mongodb_uri, args.database_name), args.batch_size)
+        success = export_backup(rows, args.path, args.backend, args.images, args.uploads)
+    else:
+        if args.backend == 'sqlite':
+            importer = SQLiteImporter(args.sqlite_path, args.replace)
+        else:
+            importer = MongoImporter(connect_mongodb(args.mongodb_uri, args.database_name), args.replace)
+        success = import_backup(read_records(args.path), importer, args.batch_size, args.uploads)
+
+    sys.exit(0 if success else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Synthetic corpus generator for benchmarks
+Creates N modules x M questions with a realistic mix of answers (one-liners,
+multi-paragraph explanations and code) and screenshot-like PNG images, and
+loads them into either backend through the repository, so the app sees the
+same records and files it would in production.
+
+    python -m benchmarks.corpus --backend sqlite --sqlite-path /tmp/bench/bench.db --uploads /tmp/bench/uploads
+"""
+
+import io
+import os
+import sys
+import random
+import argparse
+from PIL import Image, ImageDraw
+from repository import create_repository
+from thumbnails import create_thumbnails, image_dimensions
+from upload_storage import store_upload
+
+# Defaults
+DEFAULT_MODULES = 10
+DEFAULT_QUESTIONS = 50
+DEFAULT_IMAGES = 40
+DEFAULT_SEED = 42
+
+# Share of answers of each kind, roughly what real modules contain
+ANSWER_KINDS = (('short', 0.35), ('paragraphs', 0.45), ('code', 0.20))
+
+WORDS = (
+    'process thread memory page cache kernel scheduler mutex semaphore deadlock queue stack heap '
+    'pointer array index hash tree graph node edge vertex path search sort merge quick binary '
+    'network packet socket protocol router switch latency throughput bandwidth buffer stream file '
+    'disk block inode journal transaction commit rollback lock isolation consistency replica shard '
+    'compiler parser token grammar syntax runtime garbage collector allocation virtual physical'
+).split()
+
+CODE_SNIPPETS = (
+    "def {name}(items):\n    result = []\n    for item in items:\n        if item.{attr}:\n            result.append(item)\n    return result",
+    "class {Name}:\n    def __init__(self, size):\n        self.size = size\n        self.{attr} = [0] * size\n\n    def get(self, index):\n        return self.{attr}[index % self.size]",
+    "import heapq\n\ndef {name}(graph, start):\n    dist = {{start: 0}}\n    queue = [(0, start)]\n    while queue:\n        cost, node = heapq.heappop(queue)\n        for nxt, weight in graph[node]:\n            if cost + weight < dist.get(nxt, float('inf')):\n                dist[nxt] = cost + weight\n                heapq.heappush(queue, (dist[nxt], nxt))\n    return dist",
+)
+
+class _Upload(io.BytesIO):
+    """In-memory stand-in for a werkzeug FileStorage, as store_upload expects."""
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.getvalue())
+
+def sentence(rng, min_words=6, max_words=18):
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return ' '.join(words).capitalize() + '.'
+
+def make_answer(rng):
+    """One answer of a randomly chosen kind, with a realistic length."""
+    kind = rng.choices([kind for kind, _ in ANSWER_KINDS], [weight for _, weight in ANSWER_KINDS])[0]
+    if kind == 'short':
+        return sentence(rng, 3, 12)
+    if kind == 'paragraphs':
+        return '\n\n'.join(
+            ' '.join(sentence(rng) for _ in range(rng.randint(2, 6)))
+            for _ in range(rng.randint(1, 5))
+        )
+    name = rng.choice(WORDS)
+    snippet = rng.choice(CODE_SNIPPETS).format(name=name, Name=name.capitalize(), attr=rng.choice(WORDS))
+    return f"{sentence(rng)}\n\n{snippet}"
+
+def make_image(rng):
+    """A screenshot-like PNG: a light page with lines of 'text' blocks."""
+    width, height = rng.choice(((1280, 720), (1440, 900), (1920, 1080), (1024, 768), (800, 1200)))
+    image = Image.new('RGB', (width, height), (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    y = 40
+    while y < height - 40:
+        x = 40
+        while x < width - 120:
+            block = rng.randint(30, 160)
+            draw.rectangle((x, y, x + block, y + 14), fill=(rng.randint(20, 90),) * 3)
+            x += block + rng.randint(8, 16)
+        y += rng.randint(24, 40)
+
+    buffer = _Upload()
+    image.save(buffer, format='PNG', optimize=False)
+    buffer.seek(0)
+    return buffer
+
+def generate_images(upload_folder, count, rng):
+    """Store `count` distinct images (plus thumbnails); returns [(filename, size, width, height)]."""
+    os.makedirs(upload_folder, exist_ok=True)
+    thumbnail_folder = os.path.join(upload_folder, 'thumbnails')
+    images = []
+    for _ in range(count):
+        filename, _ = store_upload(make_image(rng), upload_folder, 'png')
+        file_path = os.path.join(upload_folder, filename)
+        create_thumbnails(file_path, thumbnail_folder)
+        images.append((filename, os.path.getsize(file_path), *image_dimensions(file_path)))
+    return images
+
+def generate_corpus(repository, upload_folder, modules=DEFAULT_MODULES, questions=DEFAULT_QUESTIONS,
+                    images=DEFAULT_IMAGES, seed=DEFAULT_SEED):
+    """Load modules x questions into a repository; returns the created module ids.
+
+    Questions reuse a pool of `images` files, as pasted screenshots do in practice,
+    which keeps generation fast for large corpora.
+    """
+    rng = random.Random(seed)
+    pool = generate_images(upload_folder, images, rng)
+    module_ids = []
+
+    for module_number in range(modules):
+        module_id = repository.create_module(f"Bench {module_number + 1:03d} {rng.choice(WORDS).title()}")
+        module_ids.append(module_id)
+        for question_number in range(questions):
+            filename, size, width, height = rng.choice(pool)
+            name = f"Q{question_number + 1} {' '.join(rng.choices(WORDS, k=3))}"
+            repository.add_question(module_id, name, filename, size, make_answer(rng), width, height)
+
+    return module_ids
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Quiz Partner corpus')
+    parser.add_argument('--backend', choices=['sqlite', 'mongodb'], default='sqlite', help='Target backend (default: sqlite)')
+    parser.add_argument('--sqlite-path', default='bench.db', help='SQLite database to create (default: bench.db)')
+    parser.add_argument('--mongodb-uri', default=os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/'), help='MongoDB URI')
+    parser.add_argument('--database', default='quiz_partner_bench', help='MongoDB database name (default: quiz_partner_bench)')
+    parser.add_argument('--uploads', default='bench_uploads', help='Uploads directory to fill (default: bench_uploads)')
+    parser.add_argument('--modules', type=int, default=DEFAULT_MODULES, help=f'Modules to create (default: {DEFAULT_MODULES})')
+    parser.add_argument('--questions', type=int, default=DEFAULT_QUESTIONS, help=f'Questions per module (default: {DEFAULT_QUESTIONS})')
+    parser.add_argument('--images', type=int, default=DEFAULT_IMAGES, help=f'Distinct images to generate (default: {DEFAULT_IMAGES})')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f'Random seed (default: {DEFAULT_SEED})')
+
+    args = parser.parse_args()
+
+    print("🧪 Quiz Partner - Benchmark Corpus")
+    print("=" * 60)
+
+    repository = create_repository(args.backend, mongodb_uri=args.mongodb_uri, database_name=args.database,
+                                   sqlite_path=args.sqlite_path, upload_folder=args.uploads)
+    if args.backend == 'sqlite':
+        repository.init_schema()
+    elif not repository.connect():
+        sys.exit(1)
+
+    generate_corpus(repository, args.uploads, args.modules, args.questions, args.images, args.seed)
+    print(f"✅ Created {args.modules} modules x {args.questions} questions ({args.images} images) in {args.backend}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Concurrent HTTP load generator for a running Quiz Partner instance
+Logs in once, then keeps N keep-alive connections busy for a fixed duration
+and reports throughput and latency percentiles per path.
+
+    python -m benchmarks.loadtest --url http://127.0.0.1:5001 --concurrency 50 --duration 20 / /health
+"""
+
+import sys
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlencode, urlsplit
+
+def login(host, port, username, password):
+    """Log in and return the session cookie header value."""
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    body = urlencode({'username': username, 'password': password})
+    conn.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie', '').split(';', 1)[0]
+
+    # Follow the redirect once so the welcome flash is consumed; otherwise every
+    # request would carry (and re-render) it
+    conn.request('GET', '/', headers={'Cookie': cookie})
+    response = conn.getresponse()
+    response.read()
+    cookie = (response.getheader('Set-Cookie') or cookie).split(';', 1)[0]
+    conn.close()
+    return cookie
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def run(host, port, paths, concurrency, duration, cookie):
+    """Hammer paths round-robin from `concurrency` threads; returns per-path latencies and errors."""
+    latencies = {path: [] for path in paths}
+    errors = {path: 0 for path in paths}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    headers = {'Cookie': cookie} if cookie else {}
+
+    def client(offset):
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        index = offset
+        while time.monotonic() < deadline:
+            path = paths[index % len(paths)]
+            index += 1
+            started = time.monotonic()
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                ok = False
+            elapsed = time.monotonic() - started
+            with lock:
+                if ok:
+                    latencies[path].append(elapsed)
+                else:
+                    errors[path] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test a running Quiz Partner instance')
+    parser.add_argument('paths', nargs='*', default=['/', '/health'], help='Paths to request (default: / /health)')
+    parser.add_argument('--url', default='http://127.0.0.1:5001', help='Base URL (default: http://127.0.0.1:5001)')
+    parser.add_argument('--concurrency', type=int, default=50, help='Concurrent connections (default: 50)')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds to run (default: 20)')
+    parser.add_argument('--username', default='killer', help='Login username')
+    parser.add_argument('--password', default='cheater', help='Login password')
+
+    args = parser.parse_args()
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+
+    print("🏋️ Quiz Partner - Load Test")
+    print("=" * 60)
+    print(f"🎯 {args.url}  concurrency={args.concurrency}  duration={args.duration:g}s")
+
+    cookie = login(host, port, args.username, args.password)
+    latencies, errors = run(host, port, args.paths, args.concurrency, args.duration, cookie)
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{'path':<24}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for path in args.paths:
+        values = sorted(latencies[path])
+        print(f"{path:<24}{len(values):>10}{errors[path]:>8}{len(values) / args.duration:>10.1f}"
+              f"{percentile(values, 0.5) * 1000:>9.1f}{percentile(values, 0.95) * 1000:>9.1f}"
+              f"{percentile(values, 0.99) * 1000:>9.1f}")
+    print(f"✅ {total} requests, {total / args.duration:.1f} req/s overall")
+    sys.exit(0 if total else 1)
+
+if __name__ == '__main__':
+    main()
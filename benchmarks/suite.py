@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Route benchmark suite with a stored baseline
+Generates a synthetic corpus (see benchmarks/corpus.py) into a scratch
+directory, then drives the real routes of app.py either in-process through the
+Flask test client or over HTTP against gunicorn, and reports p50/p95/p99
+latency and requests/sec per route. Results are compared with
+benchmarks/baseline.json so a change that slows a page down fails the run.
+
+Absolute latencies depend on the machine and on how busy it is, so every run
+also times a fixed workload that doesn't touch the app (calibration_workload()).
+The baseline is scaled by how much slower or faster that workload ran than when
+the baseline was saved, and routes are compared on their median, which a few
+requests slowed by other processes don't move. In client mode routes are
+interleaved, one request each per round, with a calibration sample every
+round, so a busy spell affects every route and the calibration alike.
+
+With --base-ref the stored baseline is not used: the working tree and a git
+ref (checked out into a temporary worktree) are benchmarked in turn in the same
+run, each with its own corpus generator and app. That comparison holds on any
+machine, and is the reliable one in gunicorn mode, where contention between
+workers matters more than raw speed.
+
+    python -m benchmarks.suite --backend sqlite --mode client
+    python -m benchmarks.suite --backend sqlite --mode gunicorn --base-ref main
+    python -m benchmarks.suite --backend sqlite --mode client --save-baseline
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import statistics
+import shutil
+import argparse
+import tempfile
+import importlib
+import subprocess
+import http.client
+from benchmarks.corpus import DEFAULT_IMAGES, DEFAULT_MODULES, DEFAULT_QUESTIONS, generate_corpus
+from benchmarks.loadtest import login, percentile, run
+from repository import create_repository
+
+# Configuration
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_TOLERANCE = 0.25
+# Latency changes smaller than this are noise, whatever the percentage
+NOISE_FLOOR_MS = 2.0
+CALIBRATION_ROUNDS = 30
+
+# Options passed on to the runs of each tree with --base-ref
+FORWARDED_OPTIONS = ('backend', 'mode', 'mongodb_uri', 'database', 'modules', 'questions', 'images',
+                     'requests', 'concurrency', 'duration', 'port')
+
+# Route label -> path; labels keep the baseline stable although generated ids differ per run
+ROUTES = (
+    ('dashboard', '/'),
+    ('module', '/module/{module_id}'),
+    ('answers', '/module/{module_id}/answers'),
+    ('question', '/question/{question_id}/answer'),
+    ('all_questions', '/all-questions'),
+    ('search', '/all-questions?search=cache'),
+    ('health', '/health'),
+)
+
+def build_corpus(backend, workdir, mongodb_uri, database, modules, questions, images):
+    """Generate the corpus; returns (storage env vars, path for each route label)."""
+    upload_folder = os.path.join(workdir, 'uploads')
+    sqlite_path = os.path.join(workdir, 'bench.db')
+    repository = create_repository(backend, mongodb_uri=mongodb_uri, database_name=database,
+                                   sqlite_path=sqlite_path, upload_folder=upload_folder)
+    if backend == 'sqlite':
+        # Start from an empty database when a --workdir is reused
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(sqlite_path + suffix):
+                os.remove(sqlite_path + suffix)
+        repository.init_schema()
+    else:
+        if not repository.connect():
+            sys.exit(1)
+        repository.db.modules.delete_many({})
+        repository.db.questions.delete_many({})
+
+    module_ids = generate_corpus(repository, upload_folder, modules, questions, images)
+    question = repository.module_questions(module_ids[0])[0]
+    repository.close()
+
+    ids = {'module_id': module_ids[0], 'question_id': question['id']}
+    env = {'STORAGE_BACKEND': backend, 'SQLITE_PATH': sqlite_path, 'MONGODB_URI': mongodb_uri, 'DATABASE_NAME': database}
+    return env, {label: path.format(**ids) for label, path in ROUTES}
+
+def calibration_workload():
+    """A fixed workload that doesn't depend on the app's code; returns a function running it once.
+
+    It does what requests spend their time on (Jinja rendering of escaped text,
+    JSON, hashing), so it slows down and speeds up with the machine the same way.
+    """
+    from jinja2 import Environment
+    template = Environment(autoescape=True).from_string(
+        '{% for row in rows %}<li class="{{ row.kind }}">{{ row.name }}: {{ row.text }}</li>{% endfor %}'
+    )
+    rows = [{'kind': f'kind-{i % 7}', 'name': f'Question {i}', 'text': '<code>x = 1</code> & more ' * 20}
+            for i in range(300)]
+    payload = bytes(256 * 1024)
+
+    def run():
+        started = time.perf_counter()
+        page = template.render(rows=rows)
+        json.loads(json.dumps(rows))
+        hashlib.sha256(payload + page.encode()).hexdigest()
+        return time.perf_counter() - started
+    return run
+
+def summarize(latencies, elapsed, errors=0):
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'rps': round(len(values) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(values, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 2)
+    }
+
+def bench_client(env, paths, workdir, requests, calibrate, calibration):
+    """Time each route through the Flask test client, one request at a time.
+
+    Routes take turns, one request each per round, and every round adds a
+    calibrate() sample to calibration.
+    """
+    os.environ.update(env)
+    os.chdir(workdir)
+    app_module = importlib.import_module('app')
+    app_module.app.config['TESTING'] = True
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+
+    for path in paths.values():
+        client.get(path).get_data()
+    latencies = {label: [] for label in paths}
+    errors = dict.fromkeys(paths, 0)
+    for _ in range(requests):
+        for label, path in paths.items():
+            request_started = time.perf_counter()
+            response = client.get(path)
+            # Streamed pages render while the body is read, so read it inside the timing
+            response.get_data()
+            latencies[label].append(time.perf_counter() - request_started)
+            errors[label] += response.status_code >= 400
+        calibration.append(calibrate())
+    return {label: summarize(latencies[label], sum(latencies[label]), errors[label]) for label in paths}
+
+def wait_for_server(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+def bench_gunicorn(env, paths, workdir, port, concurrency, duration, code_root=REPO_ROOT):
+    """Load each route over HTTP against gunicorn started with gunicorn.conf.py."""
+    server_env = dict(os.environ, PORT=str(port), PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'), **env)
+    command = [
+        sys.executable, '-m', 'gunicorn', '--config', os.path.join(code_root, 'gunicorn.conf.py'),
+        '--chdir', workdir, '--pythonpath', code_root, '--pid', os.path.join(workdir, 'gunicorn.pid'), 'app:app'
+    ]
+    with open(os.path.join(workdir, 'gunicorn.log'), 'w') as log:
+        server = subprocess.Popen(command, env=server_env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        if not wait_for_server(port):
+            sys.exit(f"❌ gunicorn did not become healthy; see {os.path.join(workdir, 'gunicorn.log')}")
+        cookie = login('127.0.0.1', port, 'killer', 'cheater')
+        results = {}
+        for label, path in paths.items():
+            latencies, errors = run('127.0.0.1', port, [path], concurrency, duration, cookie)
+            results[label] = summarize(latencies[path], duration, errors[path])
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def compare(results, baseline, tolerance, scale=1.0):
+    """Return the routes whose p50 got slower than the (scaled) baseline allows."""
+    regressions = []
+    for label, current in results.items():
+        previous = baseline.get(label)
+        if not previous:
+            continue
+        expected = previous['p50_ms'] * scale
+        allowed = max(expected * (1 + tolerance), expected + NOISE_FLOOR_MS)
+        if current['p50_ms'] > allowed:
+            regressions.append((label, expected, current['p50_ms']))
+    return regressions
+
+def print_results(results, baseline, scale=1.0):
+    print(f"{'route':<16}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'base p50':>10}")
+    for label, result in results.items():
+        base = baseline.get(label, {}).get('p50_ms')
+        print(f"{label:<16}{result['requests']:>10}{result['errors']:>8}{result['rps']:>10.1f}"
+              f"{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+              f"{f'{base * scale:.2f}' if base is not None else '-':>10}")
+
+def bench_tree(args, code_root):
+    """Run the suite on the code in code_root in a fresh interpreter; returns its results."""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        json_path = f.name
+    command = [sys.executable, os.path.abspath(__file__), '--code-root', code_root, '--json-out', json_path]
+    for option in FORWARDED_OPTIONS:
+        command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+    try:
+        # The tree's own app, repository and corpus generator are imported from PYTHONPATH
+        subprocess.run(command, env=dict(os.environ, PYTHONPATH=code_root), check=True)
+        with open(json_path) as f:
+            return json.load(f)['routes']
+    finally:
+        os.remove(json_path)
+
+def merge_rounds(runs):
+    """Total requests and errors, and the median of each other figure, of each route over several runs."""
+    merged = {}
+    for label in runs[0]:
+        merged[label] = {key: round(statistics.median(run[label][key] for run in runs), 2) for key in runs[0][label]}
+        for key in ('requests', 'errors'):
+            merged[label][key] = sum(run[label][key] for run in runs)
+    return merged
+
+def compare_with_ref(args):
+    """Benchmark args.base_ref and the working tree alternately and compare them."""
+    worktree = tempfile.mkdtemp(prefix='quiz_bench_base_')
+    subprocess.run(['git', '-C', REPO_ROOT, 'worktree', 'add', '--detach', worktree, args.base_ref],
+                   check=True, stdout=subprocess.DEVNULL)
+    try:
+        if not os.path.isdir(os.path.join(worktree, 'benchmarks')):
+            sys.exit(f"❌ {args.base_ref} has no benchmarks package to generate its corpus with")
+        runs = {'base': [], 'head': []}
+        for number in range(1, args.rounds + 1):
+            for side, code_root in (('base', worktree), ('head', REPO_ROOT)):
+                print(f"🔁 Round {number}/{args.rounds}: {args.base_ref if side == 'base' else 'working tree'}")
+                runs[side].append(bench_tree(args, code_root))
+    finally:
+        subprocess.run(['git', '-C', REPO_ROOT, 'worktree', 'remove', '--force', worktree], check=False)
+
+    base, head = merge_rounds(runs['base']), merge_rounds(runs['head'])
+    print(f"📊 Working tree vs {args.base_ref} (median of {args.rounds} rounds each)")
+    print_results(head, base)
+    regressions = compare(head, base, args.tolerance)
+    for label, expected, current in regressions:
+        print(f"❌ {label}: p50 {current:.2f} ms vs {expected:.2f} ms at {args.base_ref}")
+    if regressions:
+        sys.exit(1)
+    print(f"✅ No regressions against {args.base_ref}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Quiz Partner routes against a stored baseline')
+    parser.add_argument('--backend', choices=['sqlite', 'mongodb'], default='sqlite', help='Storage backend (default: sqlite)')
+    parser.add_argument('--mode', choices=['client', 'gunicorn'], default='client',
+                        help='Flask test client in-process, or HTTP against gunicorn (default: client)')
+    parser.add_argument('--mongodb-uri', default=os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/'),
+                        help='MongoDB URI (the benchmark database is emptied first)')
+    parser.add_argument('--database', default='quiz_partner_bench', help='MongoDB database (default: quiz_partner_bench)')
+    parser.add_argument('--modules', type=int, default=DEFAULT_MODULES, help=f'Modules (default: {DEFAULT_MODULES})')
+    parser.add_argument('--questions', type=int, default=DEFAULT_QUESTIONS, help=f'Questions per module (default: {DEFAULT_QUESTIONS})')
+    parser.add_argument('--images', type=int, default=DEFAULT_IMAGES, help=f'Distinct images (default: {DEFAULT_IMAGES})')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per route in client mode (default: 200)')
+    parser.add_argument('--concurrency', type=int, default=10, help='Connections in gunicorn mode (default: 10)')
+    parser.add_argument('--duration', type=float, default=5, help='Seconds per route in gunicorn mode (default: 5)')
+    parser.add_argument('--port', type=int, default=5099, help='gunicorn port (default: 5099)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline file (default: benchmarks/baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Allowed p50 slowdown before failing (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--workdir', help='Scratch directory for the corpus (default: a temporary directory)')
+    parser.add_argument('--base-ref', help='Compare with this git ref, benchmarked in the same run, instead of the baseline')
+    parser.add_argument('--rounds', type=int, default=2, help='With --base-ref: runs of each tree, alternating (default: 2)')
+    # Used by --base-ref for the run of each tree
+    parser.add_argument('--code-root', default=REPO_ROOT, help=argparse.SUPPRESS)
+    parser.add_argument('--json-out', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    key = f"{args.backend}/{args.mode}"
+    if args.base_ref:
+        return compare_with_ref(args)
+
+    print("⏱️ Quiz Partner - Route Benchmarks")
+    print("=" * 60)
+    print(f"🎯 {key}: {args.modules} modules x {args.questions} questions, {args.images} images")
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix='quiz_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    calibrate = calibration_workload()
+    calibration = [calibrate() for _ in range(CALIBRATION_ROUNDS)]
+    try:
+        env, paths = build_corpus(args.backend, workdir, args.mongodb_uri, args.database,
+                                  args.modules, args.questions, args.images)
+        if args.mode == 'client':
+            results = bench_client(env, paths, workdir, args.requests, calibrate, calibration)
+        else:
+            results = bench_gunicorn(env, paths, workdir, args.port, args.concurrency, args.duration, args.code_root)
+    finally:
+        os.chdir(REPO_ROOT)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    # Sampled on both sides of the run (and during it in client mode), as load changes while it runs
+    calibration.extend(calibrate() for _ in range(CALIBRATION_ROUNDS))
+    calibration_ms = round(statistics.median(calibration) * 1000, 3)
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump({'calibration_ms': calibration_ms, 'routes': results}, f)
+        print_results(results, {})
+        return
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    corpus = {'modules': args.modules, 'questions': args.questions, 'images': args.images}
+    baseline = baselines.get(key, {}).get('routes', {})
+    if baseline and baselines[key].get('corpus') != corpus and not args.save_baseline:
+        print(f"⚠️ The {key} baseline was measured on a different corpus ({baselines[key].get('corpus')}); not comparing")
+        baseline = {}
+
+    # How much slower (> 1) or faster this run's machine is than the baseline's
+    scale = 1.0
+    if baseline and not args.save_baseline:
+        if baselines[key].get('calibration_ms'):
+            scale = calibration_ms / baselines[key]['calibration_ms']
+            print(f"📏 Calibration {calibration_ms:.2f} ms vs {baselines[key]['calibration_ms']:.2f} ms "
+                  f"at baseline; baseline scaled by {scale:.2f}")
+        else:
+            print(f"⚠️ The {key} baseline has no calibration; comparing absolute times")
+    print_results(results, baseline, scale)
+
+    if args.save_baseline:
+        baselines[key] = {'corpus': corpus, 'calibration_ms': calibration_ms, 'routes': results}
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"💾 Saved baseline for {key} to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance, scale)
+    for label, expected, current in regressions:
+        print(f"❌ {label}: p50 {current:.2f} ms vs scaled baseline {expected:.2f} ms")
+    if regressions:
+        sys.exit(1)
+    print("✅ No regressions" if baseline else f"💡 No baseline for {key}; run with --save-baseline to store one")
+
+if __name__ == '__main__':
+    main()
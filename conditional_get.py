@@ -0,0 +1,74 @@
+"""
+HTTP conditional GET for pages rendered from the database
+A page's version is a tuple whose first item is the newest created_at/updated_at
+of the data it shows; the rest (question counts, login state) only feed the ETag.
+Routes look the version up with one cheap query, answer 304 Not Modified when the
+browser already has that version, and otherwise render and tag the response.
+"""
+
+import os
+import hashlib
+from datetime import datetime, timezone
+from flask import current_app, make_response, request, session
+
+# Configuration
+TEMPLATE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+def template_fingerprint(folder=TEMPLATE_FOLDER):
+    """Hash of every template, so a deploy that changes the markup changes every ETag."""
+    hasher = hashlib.sha256()
+    for root, dirs, files in sorted(os.walk(folder)):
+        for filename in sorted(files):
+            with open(os.path.join(root, filename), 'rb') as f:
+                hasher.update(filename.encode())
+                hasher.update(f.read())
+    return hasher.hexdigest()[:16]
+
+TEMPLATE_FINGERPRINT = template_fingerprint()
+
+def page_etag(version):
+    return hashlib.sha256(f"{TEMPLATE_FINGERPRINT}:{version!r}".encode()).hexdigest()[:32]
+
+def parse_timestamp(value):
+    """Stored created_at/updated_at (ISO or SQLite format, UTC) as an aware datetime."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def not_modified(version, trust_dates=False):
+    """Return a 304 response if the browser's copy of this page is current, else None.
+
+    If-None-Match is always checked. If-Modified-Since is only honoured when
+    trust_dates is set: deleting a question does not move a list page's newest
+    timestamp, so for lists only the ETag (which includes the count) is reliable.
+    Pages are never short-circuited while a flash message is waiting to be shown.
+    """
+    if request.method != 'GET' or '_flashes' in session:
+        return None
+
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(page_etag(version))
+    elif trust_dates and request.if_modified_since:
+        last_modified = parse_timestamp(version[0])
+        matched = last_modified is not None and last_modified.replace(microsecond=0) <= request.if_modified_since
+    else:
+        matched = False
+
+    if not matched:
+        return None
+    return with_validators(current_app.response_class(status=304), version)
+
+def with_validators(response, version):
+    """Tag a rendered page with its ETag and Last-Modified; browsers revalidate on each view."""
+    response = make_response(response)
+    response.set_etag(page_etag(version))
+    last_modified = parse_timestamp(version[0])
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
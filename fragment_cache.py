@@ -0,0 +1,85 @@
+"""
+Rendered-fragment cache for question answers
+Answers only change through edit_answer, yet the answers pages used to re-split
+and re-render every answer on every request. Rendered answers are kept in a
+per-worker LRU keyed by question id and tagged with the question's version
+(updated_at, or created_at if never edited), so an edit made in another worker
+is never served stale: the version no longer matches and the entry re-renders.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from flask import render_template
+from markupsafe import Markup
+
+# Configuration
+ANSWER_CACHE_SIZE = int(os.environ.get('ANSWER_CACHE_SIZE', '2048'))
+
+class FragmentCache:
+    """Thread-safe LRU of rendered fragments: key -> (version, group, markup)."""
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, version, render, group=None):
+        """Return the cached fragment for key at this version, rendering it on a miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        fragment = Markup(render())
+        with self.lock:
+            self.entries[key] = (version, group, fragment)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return fragment
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate_group(self, group):
+        """Drop every fragment tagged with group (e.g. all answers of a deleted module)."""
+        with self.lock:
+            for key in [key for key, entry in self.entries.items() if entry[1] == group]:
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+# Rendered answer bodies for answers.html and question_answer.html
+answer_cache = FragmentCache()
+
+def render_answer(question):
+    """Rendered, cached answer body for a question (see templates/_answer_content.html)."""
+    version = question.get('updated_at') or question.get('created_at')
+    return answer_cache.get_or_render(
+        str(question['id']),
+        version,
+        lambda: render_template('_answer_content.html', answer_text=question.get('answer')),
+        group=str(question['module_id'])
+    )
+
+def invalidate_answer(question_id):
+    """Forget a question's rendered answer after it is edited or deleted."""
+    answer_cache.invalidate(str(question_id))
+
+def invalidate_module_answers(module_id):
+    """Forget the rendered answers of every question in a deleted module."""
+    answer_cache.invalidate_group(str(module_id))
+
+def init_fragment_cache(app):
+    """Register the render_answer template helper on an app."""
+    app.add_template_global(render_answer)
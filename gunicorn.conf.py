@@ -1,14 +1,34 @@
 # Gunicorn Configuration for Quiz Partner
 import os
+import sys
 
 # Server socket
 bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
 backlog = 2048
 
 # Worker processes
-workers = 4
-worker_class = "sync"
-worker_connections = 1000
+# GUNICORN_WORKER_CLASS=gevent runs requests as greenlets, so a worker keeps serving
+# while others wait on MongoDB round trips (up to worker_connections at once per worker).
+# Keep "sync" for the SQLite backend: sqlite3 calls block the whole gevent hub.
+workers = int(os.environ.get('GUNICORN_WORKERS', '4'))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+if worker_class == 'gevent':
+    # Patch before preload_app imports the app, so PyMongo's sockets, locks and
+    # monitor threads are cooperative in the master and every worker
+    from gevent import monkey
+    monkey.patch_all()
+
+# Metrics: every worker writes its samples here and /metrics merges them.
+# Must be set before the app (and prometheus_client) is imported; cleared on each start
+# so samples from a previous run's workers are not counted again.
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/quiz_partner_metrics')
+os.makedirs(metrics_dir, exist_ok=True)
+for name in os.listdir(metrics_dir):
+    if name.endswith('.db'):
+        os.remove(os.path.join(metrics_dir, name))
+
 timeout = 30
 keepalive = 2
 
@@ -47,7 +67,26 @@ def worker_int(worker):
     worker.log.info("🔄 Worker received INT or QUIT signal")
 
 def pre_fork(server, worker):
+    # MongoClient is not fork-safe: close the master's client (used at preload for
+    # index creation) so no worker inherits its sockets or monitor state
+    app = sys.modules.get('app')
+    if app is not None:
+        app.close_storage()
     server.log.info("👷 Worker spawned (pid: %s)", worker.pid)
 
 def post_fork(server, worker):
-    server.log.info("✅ Worker ready (pid: %s)", worker.pid)
\ No newline at end of file
+    # Each worker opens its own client and connection pool; without preload_app
+    # the worker imports (and connects) the app itself
+    app = sys.modules.get('app')
+    if app is not None:
+        app.init_worker_storage()
+    server.log.info("✅ Worker ready (pid: %s)", worker.pid)
+
+def child_exit(server, worker):
+    # Let prometheus_client drop the exited worker's live gauges; its counters and
+    # histograms stay in the merged totals
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,203 @@
+"""
+Request latency instrumentation and the Prometheus /metrics endpoint
+Every request is timed per route, together with the time it spent in repository
+calls and in Jinja rendering, so a slow page shows whether the database, the
+template or everything else (file I/O, Python) is to blame.
+
+Under gunicorn each worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(set up by gunicorn.conf.py) and /metrics sums them across workers; without it
+(python app.py) the process's own registry is exported. A setting pointing at a
+directory that doesn't exist (e.g. copied from .env.example) is ignored.
+"""
+
+import os
+import time
+from flask import Response, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+
+# prometheus_client chooses multiprocess mode from this variable when it is imported,
+# and then fails every observation if the directory is missing
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+if MULTIPROC_DIR and not os.path.isdir(MULTIPROC_DIR):
+    print(f"⚠️ PROMETHEUS_MULTIPROC_DIR {MULTIPROC_DIR} does not exist; exporting this process's metrics only")
+    del os.environ['PROMETHEUS_MULTIPROC_DIR']
+    MULTIPROC_DIR = None
+
+try:
+    from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram,
+                                   generate_latest, multiprocess)
+except ImportError:
+    Histogram = None
+
+# Repository methods that talk to the database; parse_id, close and pool_stats do not
+DB_OPERATIONS = (
+    'ping', 'list_modules', 'get_module', 'create_module', 'count_module_questions', 'module_version',
+    'delete_module', 'recent_questions', 'module_questions', 'iter_module_questions', 'list_questions',
+    'search', 'get_question', 'question_version', 'questions_version', 'add_question', 'update_question',
+    'delete_question', 'referenced_images'
+)
+
+# Repository methods returning a ResultStream: their rows are fetched while the page renders
+STREAMED_OPERATIONS = ('iter_module_questions',)
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+if Histogram is not None:
+    REQUEST_DURATION = Histogram(
+        'quiz_request_duration_seconds', 'Time to handle a request, by route',
+        ['endpoint', 'method', 'status'], buckets=REQUEST_BUCKETS
+    )
+    REQUEST_PHASE_DURATION = Histogram(
+        'quiz_request_phase_seconds', 'Time a request spent in the database, in templates and elsewhere',
+        ['endpoint', 'phase'], buckets=REQUEST_BUCKETS
+    )
+    DB_DURATION = Histogram(
+        'quiz_db_operation_seconds', 'Time of a single repository call',
+        ['backend', 'operation'], buckets=DB_BUCKETS
+    )
+    MONGO_COMMAND_DURATION = Histogram(
+        'quiz_mongo_command_seconds', 'Time of a MongoDB command as seen by the driver',
+        ['command', 'collection'], buckets=DB_BUCKETS
+    )
+    TEMPLATE_DURATION = Histogram(
+        'quiz_template_render_seconds', 'Time to render a Jinja template (including templates it renders)',
+        ['template'], buckets=DB_BUCKETS
+    )
+
+def timed_operation(backend, operation, method):
+    """Wrap a repository method so each call is recorded and charged to the current request."""
+    histogram = DB_DURATION.labels(backend, operation)
+
+    streamed = operation in STREAMED_OPERATIONS
+
+    def wrapper(*args, **kwargs):
+        # Only the outermost call counts towards the request, so nested calls are not added twice
+        track = has_request_context()
+        if track:
+            g.metrics_db_depth = getattr(g, 'metrics_db_depth', 0) + 1
+        started = time.perf_counter()
+        result = None
+        try:
+            result = method(*args, **kwargs)
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            if streamed and result is not None:
+                # Observed once the template has read the last row
+                result.rows = timed_rows(result.rows, histogram, elapsed)
+            else:
+                histogram.observe(elapsed)
+            if track:
+                g.metrics_db_depth -= 1
+                if g.metrics_db_depth == 0:
+                    g.metrics_db_time = getattr(g, 'metrics_db_time', 0.0) + elapsed
+
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+def timed_rows(rows, histogram, elapsed):
+    """Yield rows from a live cursor, timing each fetch as part of the call that opened it.
+
+    The fetches happen while a streamed template iterates the rows, so they are
+    charged to the request's database phase and taken out of its render phase.
+    """
+    try:
+        while True:
+            started = time.perf_counter()
+            row = next(rows, None)
+            fetch = time.perf_counter() - started
+            elapsed += fetch
+            if has_request_context():
+                g.metrics_db_time = g.get('metrics_db_time', 0.0) + fetch
+                g.metrics_render_db_time = g.get('metrics_render_db_time', 0.0) + fetch
+            if row is None:
+                return
+            yield row
+    finally:
+        histogram.observe(elapsed)
+
+def observe_mongo_command(command, collection, seconds):
+    MONGO_COMMAND_DURATION.labels(command, collection).observe(seconds)
+
+def instrument_repository(repository):
+    """Time every database call the repository makes, and each MongoDB command it sends."""
+    for operation in DB_OPERATIONS:
+        method = getattr(repository, operation, None)
+        if method is not None:
+            setattr(repository, operation, timed_operation(repository.name, operation, method))
+    if hasattr(repository, 'command_observers'):
+        repository.command_observers.append(observe_mongo_command)
+
+def template_started(sender, template, context, **extra):
+    g.setdefault('metrics_templates', []).append(time.perf_counter())
+
+def template_finished(sender, template, context, **extra):
+    # Templates can render other templates (e.g. cached answer fragments); only the
+    # outermost one is charged to the request's render phase
+    stack = g.get('metrics_templates')
+    if not stack:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+    TEMPLATE_DURATION.labels(template.name or 'string').observe(elapsed)
+    if not stack:
+        g.metrics_render_time = g.get('metrics_render_time', 0.0) + elapsed
+
+def metrics_registry():
+    """Registry to export: the merged worker files in multiprocess mode, else this process."""
+    # The variable prometheus_client read at import (a missing directory was unset above)
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ and os.path.isdir(os.environ['PROMETHEUS_MULTIPROC_DIR']):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+def observe_request(state, endpoint, method, status, started):
+    """Record a finished request's duration and how it splits into db, render and other time."""
+    elapsed = time.perf_counter() - started
+    db_time = state.get('metrics_db_time', 0.0)
+    # Rows a streamed template fetched while rendering count as database time
+    render_time = max(0.0, state.get('metrics_render_time', 0.0) - state.get('metrics_render_db_time', 0.0))
+    if state.get('stream_failed'):
+        status = 500
+
+    REQUEST_DURATION.labels(endpoint, method, status).observe(elapsed)
+    REQUEST_PHASE_DURATION.labels(endpoint, 'db').observe(db_time)
+    REQUEST_PHASE_DURATION.labels(endpoint, 'render').observe(render_time)
+    REQUEST_PHASE_DURATION.labels(endpoint, 'other').observe(max(0.0, elapsed - db_time - render_time))
+
+def init_metrics(app, repository):
+    """Instrument an app and its repository and register the /metrics route."""
+    if Histogram is None:
+        print("⚠️ prometheus_client is not installed; /metrics is disabled")
+        return
+
+    instrument_repository(repository)
+    before_render_template.connect(template_started, app)
+    template_rendered.connect(template_finished, app)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        endpoint, method = request.endpoint or 'unmatched', request.method
+        if response.is_streamed:
+            # The body (a streamed page, or a file) is produced after this hook runs, so
+            # record once it has been sent; g outlives the request context for that
+            state = g._get_current_object()
+            response.call_on_close(lambda: observe_request(state, endpoint, method, response.status_code, started))
+        else:
+            observe_request(g, endpoint, method, response.status_code, started)
+        return response
+
+    def metrics():
+        """Prometheus scrape endpoint, aggregated across gunicorn workers."""
+        return Response(generate_latest(metrics_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
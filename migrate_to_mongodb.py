@@ -7,18 +7,30 @@ Migrates Quiz Partner data from SQLite to MongoDB Atlas
 import sqlite3
 import os
 import sys
+import time
+import shutil
 from datetime import datetime
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
 import json
 from bson import ObjectId
 import argparse
+from repository import build_search_terms
+from upload_storage import CONTENT_HASH_PATTERN, file_sha256
+
+DEFAULT_BATCH_SIZE = 1000
+CHECKPOINT_ID = 'sqlite_sync'
+DEFAULT_IMAGE_WORKERS = 16
 
 class DatabaseMigrator:
-    def __init__(self, sqlite_path, mongodb_uri, database_name):
+    def __init__(self, sqlite_path, mongodb_uri, database_name, batch_size=DEFAULT_BATCH_SIZE,
+                 uploads_dir='uploads'):
         self.sqlite_path = sqlite_path
         self.mongodb_uri = mongodb_uri
         self.database_name = database_name
+        self.batch_size = batch_size
+        self.uploads_dir = uploads_dir
         self.mongo_client = None
         self.mongo_db = None
         
@@ -55,26 +67,47 @@ class DatabaseMigrator:
             print(f"❌ Failed to connect to SQLite: {e}")
             return None
     
-    def get_sqlite_data(self, conn):
-        """Extract data from SQLite database"""
+    def count_sqlite_rows(self, conn):
+        """Count the rows to migrate without loading them"""
         try:
-            print("📊 Extracting data from SQLite...")
-            
-            # Get modules
-            modules_cursor = conn.execute("SELECT * FROM modules ORDER BY id")
-            modules = [dict(row) for row in modules_cursor.fetchall()]
+            modules_count = conn.execute("SELECT COUNT(*) FROM modules").fetchone()[0]
+            questions_count = conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
             
-            # Get questions
-            questions_cursor = conn.execute("SELECT * FROM questions ORDER BY id")
-            questions = [dict(row) for row in questions_cursor.fetchall()]
-            
-            print(f"📦 Found {len(modules)} modules and {len(questions)} questions")
-            return modules, questions
+            print(f"📦 Found {modules_count} modules and {questions_count} questions")
+            return modules_count, questions_count
             
         except Exception as e:
-            print(f"❌ Error extracting SQLite data: {e}")
+            print(f"❌ Error reading SQLite data: {e}")
             return None, None
     
+    def stream_rows(self, conn, query):
+        """Yield lists of at most batch_size rows from a SQLite query"""
+        cursor = conn.execute(query)
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            yield [dict(row) for row in rows]
+    
+    def insert_batch(self, collection, docs, batch_number):
+        """Insert one batch with an unordered insert_many.
+
+        Returns the indexes (within docs) of documents that failed to insert.
+        """
+        try:
+            collection.insert_many(docs, ordered=False)
+            return []
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            first_error = errors[0]['errmsg'] if errors else str(e)
+            print(f"  ⚠️ Batch {batch_number}: {len(errors)} of {len(docs)} documents failed ({first_error})")
+            return [error['index'] for error in errors]
+    
+    def report_progress(self, label, batch_number, done, total, started_at):
+        """Print a one-line progress report with throughput"""
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+        print(f"  📤 {label} batch {batch_number}: {done}/{total} rows ({done / elapsed:,.0f} rows/s)")
+    
     def create_mongodb_collections(self):
         """Create MongoDB collections with indexes"""
         try:
@@ -97,6 +130,10 @@ class DatabaseMigrator:
             questions_collection.create_index("created_at")
             questions_collection.create_index([("module_id", 1), ("created_at", -1)])
             
+            # Lookup keys for incremental sync
+            modules_collection.create_index("migrated_from_sqlite_id", sparse=True)
+            questions_collection.create_index("migrated_from_sqlite_id", sparse=True)
+            
             print("✅ Collections and indexes created successfully!")
             return True
             
@@ -104,8 +141,26 @@ class DatabaseMigrator:
             print(f"❌ Error creating MongoDB collections: {e}")
             return False
     
-    def migrate_modules(self, modules):
-        """Migrate modules to MongoDB"""
+    def build_question_doc(self, question, module_object_id):
+        """Build the MongoDB document for a SQLite question row"""
+        image_path = os.path.join(self.uploads_dir, question['image_path'])
+        doc = {
+            'module_id': module_object_id,
+            'name': question['name'],
+            'image_path': question['image_path'],
+            'image_size': os.path.getsize(image_path) if os.path.isfile(image_path) else 0,
+            'answer': question['answer'],
+            'search_terms': build_search_terms(question['name'], question['answer']),
+            'created_at': question['created_at'],
+            'migrated_from_sqlite_id': question['id'],
+            'migration_timestamp': datetime.utcnow()
+        }
+        if question.get('updated_at'):
+            doc['updated_at'] = question['updated_at']
+        return doc
+    
+    def migrate_modules(self, conn, total):
+        """Migrate modules to MongoDB in batches"""
         try:
             print("📦 Migrating modules...")
             modules_collection = self.mongo_db.modules
@@ -113,27 +168,31 @@ class DatabaseMigrator:
             # Clear existing data if any
             modules_collection.delete_many({})
             
-            # Create mapping from old ID to new ObjectId
+            # Create mapping from old ID to new ObjectId; ids are assigned client-side
+            # so the mapping is known without reading inserted documents back
             id_mapping = {}
-            
-            for module in modules:
-                old_id = module['id']
+            done = 0
+            started_at = time.monotonic()
+            
+            for batch_number, modules in enumerate(self.stream_rows(conn, "SELECT * FROM modules ORDER BY id"), 1):
+                docs = [
+                    {
+                        '_id': ObjectId(),
+                        'name': module['name'],
+                        'created_at': module['created_at'],
+                        'migrated_from_sqlite_id': module['id'],
+                        'migration_timestamp': datetime.utcnow()
+                    }
+                    for module in modules
+                ]
+                failed = set(self.insert_batch(modules_collection, docs, batch_number))
                 
-                # Create MongoDB document
-                mongo_doc = {
-                    'name': module['name'],
-                    'created_at': module['created_at'],
-                    'migrated_from_sqlite_id': old_id,
-                    'migration_timestamp': datetime.utcnow()
-                }
+                for index, doc in enumerate(docs):
+                    if index not in failed:
+                        id_mapping[doc['migrated_from_sqlite_id']] = doc['_id']
                 
-                try:
-                    result = modules_collection.insert_one(mongo_doc)
-                    id_mapping[old_id] = result.inserted_id
-                    print(f"  ✅ Migrated module: {module['name']}")
-                    
-                except DuplicateKeyError:
-                    print(f"  ⚠️ Duplicate module name: {module['name']} - skipping")
+                done += len(docs)
+                self.report_progress("Modules", batch_number, done, total, started_at)
                     
             print(f"✅ Successfully migrated {len(id_mapping)} modules")
             return id_mapping
@@ -142,8 +201,8 @@ class DatabaseMigrator:
             print(f"❌ Error migrating modules: {e}")
             return None
     
-    def migrate_questions(self, questions, module_id_mapping):
-        """Migrate questions to MongoDB"""
+    def migrate_questions(self, conn, total, module_id_mapping):
+        """Migrate questions to MongoDB in batches streamed from SQLite"""
         try:
             print("❓ Migrating questions...")
             questions_collection = self.mongo_db.questions
@@ -153,39 +212,32 @@ class DatabaseMigrator:
             
             migrated_count = 0
             skipped_count = 0
+            done = 0
+            started_at = time.monotonic()
             
-            for question in questions:
-                old_module_id = question['module_id']
+            for batch_number, questions in enumerate(self.stream_rows(conn, "SELECT * FROM questions ORDER BY id"), 1):
+                docs = []
+                for question in questions:
+                    old_module_id = question['module_id']
+                    
+                    # Skip questions whose module was not migrated
+                    if old_module_id not in module_id_mapping:
+                        skipped_count += 1
+                        continue
+                    
+                    docs.append(self.build_question_doc(question, module_id_mapping[old_module_id]))
                 
-                # Check if module exists in mapping
-                if old_module_id not in module_id_mapping:
-                    print(f"  ⚠️ Skipping question - module ID {old_module_id} not found")
-                    skipped_count += 1
-                    continue
+                failed = self.insert_batch(questions_collection, docs, batch_number) if docs else []
+                migrated_count += len(docs) - len(failed)
+                skipped_count += len(failed)
                 
-                # Create MongoDB document
-                mongo_doc = {
-                    'module_id': module_id_mapping[old_module_id],
-                    'name': question['name'],
-                    'image_path': question['image_path'],
-                    'answer': question['answer'],
-                    'created_at': question['created_at'],
-                    'migrated_from_sqlite_id': question['id'],
-                    'migration_timestamp': datetime.utcnow()
-                }
-                
-                try:
-                    questions_collection.insert_one(mongo_doc)
-                    migrated_count += 1
-                    print(f"  ✅ Migrated question: {question['name']}")
-                    
-                except Exception as e:
-                    print(f"  ❌ Error migrating question {question['name']}: {e}")
-                    skipped_count += 1
+                done += len(questions)
+                self.report_progress("Questions", batch_number, done, total, started_at)
             
-            print(f"✅ Successfully migrated {migrated_count} questions")
+            elapsed = max(time.monotonic() - started_at, 1e-6)
+            print(f"✅ Successfully migrated {migrated_count} questions in {elapsed:.1f}s ({migrated_count / elapsed:,.0f} rows/s)")
             if skipped_count > 0:
-                print(f"⚠️ Skipped {skipped_count} questions due to errors")
+                print(f"⚠️ Skipped {skipped_count} questions (missing module or insert errors)")
                 
             return migrated_count
             
@@ -193,6 +245,259 @@ class DatabaseMigrator:
             print(f"❌ Error migrating questions: {e}")
             return 0
     
+    def load_checkpoint(self):
+        """Return the last sync checkpoint stored in MongoDB, or an empty one"""
+        return self.mongo_db.migration_state.find_one({'_id': CHECKPOINT_ID}) or {}
+    
+    def save_checkpoint(self, **fields):
+        """Persist sync progress so an interrupted run resumes where it stopped"""
+        fields['sqlite_path'] = self.sqlite_path
+        fields['checkpoint_timestamp'] = datetime.utcnow()
+        self.mongo_db.migration_state.update_one({'_id': CHECKPOINT_ID}, {'$set': fields}, upsert=True)
+    
+    def current_high_water_marks(self, conn):
+        """Highest row ids and edit timestamp currently in SQLite"""
+        marks = {
+            'modules_last_id': conn.execute("SELECT COALESCE(MAX(id), 0) FROM modules").fetchone()[0],
+            'questions_last_id': conn.execute("SELECT COALESCE(MAX(id), 0) FROM questions").fetchone()[0]
+        }
+        if self.has_updated_at(conn):
+            marks['questions_last_updated'] = conn.execute("SELECT MAX(updated_at) FROM questions").fetchone()[0]
+        return marks
+    
+    def has_updated_at(self, conn):
+        """Whether this SQLite database tracks question edits"""
+        return any(row['name'] == 'updated_at' for row in conn.execute("PRAGMA table_info(questions)"))
+    
+    def load_module_mapping(self):
+        """Map SQLite module ids to the ObjectIds of already-migrated modules"""
+        return {
+            doc['migrated_from_sqlite_id']: doc['_id']
+            for doc in self.mongo_db.modules.find(
+                {'migrated_from_sqlite_id': {'$exists': True}}, {'migrated_from_sqlite_id': 1}
+            )
+        }
+    
+    def upsert_batch(self, collection, docs, batch_number):
+        """Upsert one batch keyed on migrated_from_sqlite_id.
+
+        Returns ({index: upserted _id}, failed indexes) for the batch.
+        """
+        operations = [
+            UpdateOne({'migrated_from_sqlite_id': doc['migrated_from_sqlite_id']}, {'$set': doc}, upsert=True)
+            for doc in docs
+        ]
+        try:
+            result = collection.bulk_write(operations, ordered=False)
+            return result.upserted_ids, []
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            first_error = errors[0]['errmsg'] if errors else str(e)
+            print(f"  ⚠️ Batch {batch_number}: {len(errors)} of {len(docs)} upserts failed ({first_error})")
+            upserted = {item['index']: item['_id'] for item in e.details.get('upserted', [])}
+            return upserted, [error['index'] for error in errors]
+    
+    def sync_modules(self, conn, checkpoint):
+        """Upsert modules created since the checkpoint; returns the full id mapping"""
+        print("📦 Syncing new modules...")
+        id_mapping = self.load_module_mapping()
+        last_id = checkpoint.get('modules_last_id', 0)
+        synced = 0
+        
+        query = f"SELECT * FROM modules WHERE id > {int(last_id)} ORDER BY id"
+        for batch_number, modules in enumerate(self.stream_rows(conn, query), 1):
+            docs = [
+                {
+                    'name': module['name'],
+                    'created_at': module['created_at'],
+                    'migrated_from_sqlite_id': module['id'],
+                    'migration_timestamp': datetime.utcnow()
+                }
+                for module in modules
+            ]
+            upserted, failed = self.upsert_batch(self.mongo_db.modules, docs, batch_number)
+            for index, object_id in upserted.items():
+                id_mapping[docs[index]['migrated_from_sqlite_id']] = object_id
+            synced += len(docs) - len(failed)
+            
+            # Only move the checkpoint past batches that fully succeeded
+            if failed:
+                break
+            self.save_checkpoint(modules_last_id=modules[-1]['id'])
+        
+        print(f"✅ Synced {synced} modules")
+        return id_mapping
+    
+    def sync_questions(self, conn, checkpoint, module_id_mapping):
+        """Upsert questions added or edited since the checkpoint.
+
+        Returns the set of module ObjectIds whose questions changed, or None on
+        failure.
+        """
+        print("❓ Syncing new and edited questions...")
+        last_id = int(checkpoint.get('questions_last_id', 0))
+        last_updated = checkpoint.get('questions_last_updated')
+        # Edits are read in id order, not edit order, so the edit mark only moves
+        # to the pass's starting snapshot once the whole pass has been copied
+        updated_snapshot = None
+        if self.has_updated_at(conn):
+            updated_snapshot = conn.execute("SELECT MAX(updated_at) FROM questions").fetchone()[0]
+        
+        query = f"SELECT * FROM questions WHERE id > {last_id}"
+        params = ()
+        if self.has_updated_at(conn) and last_updated:
+            # >= so rows edited within the checkpoint's second are not missed; upserts are idempotent
+            query += " OR updated_at >= ?"
+            params = (last_updated,)
+        elif self.has_updated_at(conn) and checkpoint:
+            # No edits had been seen at the last checkpoint, so any edit is new
+            query += " OR updated_at IS NOT NULL"
+        query += " ORDER BY id"
+        
+        cursor = conn.execute(query, params)
+        touched_modules = set()
+        synced = skipped = 0
+        started_at = time.monotonic()
+        checkpoint_ok = True
+        batch_number = 0
+        
+        while True:
+            rows = [dict(row) for row in cursor.fetchmany(self.batch_size)]
+            if not rows:
+                break
+            batch_number += 1
+            
+            docs = [
+                self.build_question_doc(question, module_id_mapping[question['module_id']])
+                for question in rows if question['module_id'] in module_id_mapping
+            ]
+            skipped += len(rows) - len(docs)
+            _, failed = self.upsert_batch(self.mongo_db.questions, docs, batch_number) if docs else ({}, [])
+            synced += len(docs) - len(failed)
+            skipped += len(failed)
+            touched_modules.update(doc['module_id'] for doc in docs)
+            
+            # Only move the checkpoint past batches that fully succeeded
+            checkpoint_ok = checkpoint_ok and not failed
+            if checkpoint_ok:
+                last_id = max(last_id, rows[-1]['id'])
+                self.save_checkpoint(questions_last_id=last_id)
+            
+            elapsed = max(time.monotonic() - started_at, 1e-6)
+            print(f"  📤 Questions batch {batch_number}: {synced} synced ({synced / elapsed:,.0f} rows/s)")
+        
+        if checkpoint_ok and updated_snapshot:
+            self.save_checkpoint(questions_last_updated=updated_snapshot)
+        
+        print(f"✅ Synced {synced} questions")
+        if skipped:
+            print(f"⚠️ Skipped {skipped} questions (missing module or upsert errors)")
+        return touched_modules
+    
+    def prune_deleted(self, conn):
+        """Remove migrated documents whose SQLite rows no longer exist.
+
+        Documents created directly in MongoDB (no migrated_from_sqlite_id) are left alone.
+        Returns the module ObjectIds that lost questions.
+        """
+        print("🧹 Pruning rows deleted from SQLite...")
+        touched_modules = set()
+        for table, collection in (('questions', self.mongo_db.questions), ('modules', self.mongo_db.modules)):
+            sqlite_ids = {row[0] for row in conn.execute(f"SELECT id FROM {table}")}
+            stale = [
+                doc for doc in collection.find(
+                    {'migrated_from_sqlite_id': {'$exists': True}},
+                    {'migrated_from_sqlite_id': 1, 'module_id': 1}
+                )
+                if doc['migrated_from_sqlite_id'] not in sqlite_ids
+            ]
+            if not stale:
+                continue
+            
+            stale_ids = [doc['_id'] for doc in stale]
+            if table == 'modules':
+                self.mongo_db.questions.delete_many({'module_id': {'$in': stale_ids}})
+            else:
+                touched_modules.update(doc['module_id'] for doc in stale)
+            collection.delete_many({'_id': {'$in': stale_ids}})
+            print(f"  🗑️ Removed {len(stale_ids)} {table}")
+        return touched_modules
+    
+    def refresh_module_stats(self, module_ids, changed_at=None):
+        """Recompute the app's denormalized module counters for the given modules
+
+        changed_at, if given, is the earliest last_updated recorded, so page
+        versions move on even when reloaded rows carry the same timestamps.
+        """
+        module_ids = list(module_ids)
+        if not module_ids:
+            return
+        stats = {
+            row['_id']: row for row in self.mongo_db.questions.aggregate([
+                {'$match': {'module_id': {'$in': module_ids}}},
+                {
+                    '$group': {
+                        '_id': '$module_id',
+                        'question_count': {'$sum': 1},
+                        'image_bytes': {'$sum': '$image_size'},
+                        'last_updated': {'$max': {'$ifNull': ['$updated_at', '$created_at']}}
+                    }
+                }
+            ])
+        }
+        operations = []
+        for module_id in module_ids:
+            row = stats.get(module_id, {})
+            fields = {'question_count': row.get('question_count', 0), 'image_bytes': row.get('image_bytes', 0)}
+            last_updated = max(filter(None, (row.get('last_updated'), changed_at)), default=None)
+            if last_updated:
+                fields['last_updated'] = last_updated
+            operations.append(UpdateOne({'_id': module_id}, {'$set': fields}))
+        self.mongo_db.modules.bulk_write(operations, ordered=False)
+    
+    def sync(self, prune=False):
+        """Incremental sync: copy only rows added or edited since the last run"""
+        print("🔄 Starting incremental SQLite to MongoDB sync...")
+        print("=" * 50)
+        
+        if not self.connect_mongodb():
+            return False
+        
+        sqlite_conn = self.connect_sqlite()
+        if not sqlite_conn:
+            return False
+        
+        try:
+            if not self.create_mongodb_collections():
+                return False
+            
+            checkpoint = self.load_checkpoint()
+            if checkpoint:
+                print(f"📍 Resuming after module {checkpoint.get('modules_last_id', 0)}, "
+                      f"question {checkpoint.get('questions_last_id', 0)}")
+            else:
+                print("📍 No checkpoint found - copying everything")
+            
+            module_id_mapping = self.sync_modules(sqlite_conn, checkpoint)
+            touched_modules = self.sync_questions(sqlite_conn, self.load_checkpoint(), module_id_mapping)
+            
+            if prune:
+                touched_modules |= self.prune_deleted(sqlite_conn)
+            
+            self.refresh_module_stats(touched_modules)
+            
+            print("\n🎉 Incremental sync completed!")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Sync failed: {e}")
+            return False
+            
+        finally:
+            sqlite_conn.close()
+            if self.mongo_client:
+                self.mongo_client.close()
+    
     def verify_migration(self, original_modules_count, original_questions_count):
         """Verify the migration was successful"""
         try:
@@ -220,7 +525,108 @@ class DatabaseMigrator:
             print(f"❌ Error verifying migration: {e}")
             return False
     
-    def create_backup_info(self, modules, questions):
+    def transfer_image(self, filename, target_dir, verify_only):
+        """Copy (or only verify) one referenced image; returns (status, bytes)"""
+        source_path = os.path.join(self.uploads_dir, filename)
+        if not os.path.isfile(source_path):
+            return 'missing', 0
+        
+        source_hash = file_sha256(source_path)
+        size = os.path.getsize(source_path)
+        
+        # Content-addressed uploads must hash to their own name
+        stem = filename.rsplit('.', 1)[0]
+        if CONTENT_HASH_PATTERN.match(stem) and stem != source_hash:
+            return 'corrupt', size
+        
+        if target_dir is None:
+            return 'verified', size
+        
+        target_path = os.path.join(target_dir, filename)
+        if os.path.isfile(target_path) and file_sha256(target_path) == source_hash:
+            return 'verified', size
+        if verify_only:
+            return 'mismatch' if os.path.exists(target_path) else 'absent', size
+        
+        temp_path = os.path.join(target_dir, f".{filename}.tmp")
+        try:
+            shutil.copyfile(source_path, temp_path)
+            if file_sha256(temp_path) != source_hash:
+                return 'mismatch', size
+            os.replace(temp_path, target_path)
+            return 'copied', size
+        finally:
+            # Never leave a partial copy behind (a no-op once it has been moved into place)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def transfer_images(self, target_dir=None, verify_only=False, workers=DEFAULT_IMAGE_WORKERS):
+        """Copy or verify every image SQLite references, in parallel.
+
+        Each file is checksummed with SHA-256 on both sides. Also reports
+        referenced files missing from the uploads directory and files in it
+        that no question references (orphans).
+        """
+        print("🖼️ Transferring question images..." if target_dir and not verify_only else "🔍 Verifying question images...")
+        
+        conn = self.connect_sqlite()
+        if not conn:
+            return False
+        try:
+            referenced = {row[0] for row in conn.execute("SELECT DISTINCT image_path FROM questions")}
+        finally:
+            conn.close()
+        
+        if target_dir and not verify_only:
+            os.makedirs(target_dir, exist_ok=True)
+        
+        results = {}
+        total_bytes = 0
+        started_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                filename: executor.submit(self.transfer_image, filename, target_dir, verify_only)
+                for filename in sorted(referenced)
+            }
+            for filename, future in futures.items():
+                try:
+                    status, size = future.result()
+                except OSError as e:
+                    print(f"  ❌ {filename}: {e}")
+                    status, size = 'failed', 0
+                results.setdefault(status, []).append(filename)
+                total_bytes += size
+        
+        # Files in the uploads directory that no question references
+        orphaned = sorted(
+            filename for filename in os.listdir(self.uploads_dir)
+            if not filename.startswith('.')
+            and os.path.isfile(os.path.join(self.uploads_dir, filename))
+            and filename not in referenced
+        ) if os.path.isdir(self.uploads_dir) else []
+        
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+        print(f"📊 Image Summary ({len(referenced)} referenced, {total_bytes / 1024 / 1024:.1f} MB "
+              f"in {elapsed:.1f}s, {total_bytes / 1024 / 1024 / elapsed:.1f} MB/s):")
+        for status in ('copied', 'verified', 'absent', 'mismatch', 'corrupt', 'missing', 'failed'):
+            if results.get(status):
+                print(f"  {status.capitalize()}: {len(results[status])}")
+        for status in ('missing', 'corrupt', 'mismatch', 'absent', 'failed'):
+            for filename in results.get(status, [])[:20]:
+                print(f"  ⚠️ {status}: {filename}")
+        if orphaned:
+            print(f"  Orphaned (unreferenced) files: {len(orphaned)}")
+            for filename in orphaned[:20]:
+                print(f"  🗑️ orphan: {filename}")
+        
+        problems = sum(len(results.get(status, [])) for status in ('missing', 'corrupt', 'mismatch', 'absent', 'failed'))
+        if problems:
+            print(f"⚠️ {problems} images need attention")
+        else:
+            print("✅ All referenced images are present and verified!")
+        return problems == 0
+    
+    def create_backup_info(self, modules_count, questions_count):
         """Create a backup info file"""
         try:
             backup_info = {
@@ -228,8 +634,9 @@ class DatabaseMigrator:
                 'sqlite_path': self.sqlite_path,
                 'mongodb_uri': self.mongodb_uri.split('@')[1] if '@' in self.mongodb_uri else 'hidden',
                 'database_name': self.database_name,
-                'original_modules_count': len(modules),
-                'original_questions_count': len(questions),
+                'original_modules_count': modules_count,
+                'original_questions_count': questions_count,
+                'batch_size': self.batch_size,
                 'status': 'completed'
             }
             
@@ -258,29 +665,38 @@ class DatabaseMigrator:
             return False
         
         try:
-            # Extract SQLite data
-            modules, questions = self.get_sqlite_data(sqlite_conn)
-            if modules is None or questions is None:
+            # Count SQLite data
+            modules_count, questions_count = self.count_sqlite_rows(sqlite_conn)
+            if modules_count is None or questions_count is None:
                 return False
             
             # Create backup info
-            self.create_backup_info(modules, questions)
+            self.create_backup_info(modules_count, questions_count)
             
             # Setup MongoDB collections
             if not self.create_mongodb_collections():
                 return False
             
             # Migrate data
-            module_id_mapping = self.migrate_modules(modules)
+            module_id_mapping = self.migrate_modules(sqlite_conn, modules_count)
             if not module_id_mapping:
                 return False
             
-            migrated_questions = self.migrate_questions(questions, module_id_mapping)
-            if migrated_questions == 0 and len(questions) > 0:
+            migrated_questions = self.migrate_questions(sqlite_conn, questions_count, module_id_mapping)
+            if migrated_questions == 0 and questions_count > 0:
                 return False
             
+            # Every page was rebuilt, so stamp the modules with the migration time: cached
+            # pages must not match the new data's ETags even if counts and timestamps do
+            self.refresh_module_stats(module_id_mapping.values(), changed_at=datetime.utcnow().isoformat())
+            
+            # Record where this load ended so later --incremental runs only copy changes;
+            # the old checkpoint is dropped so no mark from an earlier sync survives
+            self.mongo_db.migration_state.delete_one({'_id': CHECKPOINT_ID})
+            self.save_checkpoint(**self.current_high_water_marks(sqlite_conn))
+            
             # Verify migration
-            success = self.verify_migration(len(modules), len(questions))
+            success = self.verify_migration(modules_count, questions_count)
             
             if success:
                 print("\n🎉 Migration completed successfully!")
@@ -304,9 +720,17 @@ class DatabaseMigrator:
 
 def main():
     parser = argparse.ArgumentParser(description='Migrate Quiz Partner from SQLite to MongoDB Atlas')
-    parser.add_argument('--mongodb-uri', required=True, help='MongoDB Atlas connection string')
+    parser.add_argument('--mongodb-uri', help='MongoDB Atlas connection string')
     parser.add_argument('--database-name', default='quiz_partner', help='MongoDB database name (default: quiz_partner)')
     parser.add_argument('--sqlite-path', default='Crime_platform.db', help='SQLite database path (default: Crime_platform.db)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help=f'Rows per bulk insert (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--uploads-dir', default='uploads', help='Uploads directory used to record image sizes (default: uploads)')
+    parser.add_argument('--incremental', action='store_true', help='Upsert only rows added or edited since the last run instead of wiping and reloading')
+    parser.add_argument('--prune', action='store_true', help='With --incremental, also remove documents whose SQLite rows were deleted')
+    parser.add_argument('--images-target', help='Copy referenced images to this directory after migrating, verifying SHA-256 checksums')
+    parser.add_argument('--verify-images', action='store_true', help='Only checksum and report images (against --images-target if given); copy nothing')
+    parser.add_argument('--images-only', action='store_true', help='Run only the image stage, without touching MongoDB')
+    parser.add_argument('--image-workers', type=int, default=DEFAULT_IMAGE_WORKERS, help=f'Parallel image copy/verify threads (default: {DEFAULT_IMAGE_WORKERS})')
     
     args = parser.parse_args()
     
@@ -314,7 +738,7 @@ def main():
     print("=" * 60)
     
     # Validate inputs
-    if not args.mongodb_uri:
+    if not args.mongodb_uri and not args.images_only:
         print("❌ MongoDB URI is required!")
         sys.exit(1)
     
@@ -322,10 +746,23 @@ def main():
     migrator = DatabaseMigrator(
         sqlite_path=args.sqlite_path,
         mongodb_uri=args.mongodb_uri,
-        database_name=args.database_name
+        database_name=args.database_name,
+        batch_size=args.batch_size,
+        uploads_dir=args.uploads_dir
     )
     
-    success = migrator.migrate()
+    if args.images_only:
+        success = True
+    else:
+        success = migrator.sync(prune=args.prune) if args.incremental else migrator.migrate()
+    
+    # Image stage: copy and/or verify the files the migrated questions reference
+    if success and (args.images_only or args.images_target or args.verify_images):
+        success = migrator.transfer_images(
+            target_dir=args.images_target,
+            verify_only=args.verify_images,
+            workers=args.image_workers
+        )
     
     if success:
         print("\n✅ Migration completed successfully!")
@@ -0,0 +1,1416 @@
+"""
+Storage layer for Quiz Partner
+The routes talk to a Repository instead of to MongoDB or SQLite directly, so
+query tuning, caching and instrumentation live in one place per backend.
+STORAGE_BACKEND selects the implementation ('mongodb' or 'sqlite').
+
+Modules and questions are returned as plain dicts. Every record has an 'id'
+usable in URLs; questions also carry 'module_id' and, where the listing needs
+it, 'module_name'.
+"""
+
+import os
+import re
+import html
+import time
+import base64
+import sqlite3
+import threading
+import importlib.util
+from contextlib import contextmanager
+from datetime import datetime
+from markupsafe import Markup, escape
+
+# Configuration
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongodb').lower()
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'Crime_platform.db')
+UPLOAD_FOLDER = 'uploads'
+
+# SQLite connection pool and pragmas (applied once per pooled connection)
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', '4'))
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', '20'))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', str(16 * 1024)))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+# MongoDB client settings (one client per worker process)
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '50'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '2'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '10000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '20000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', 'zstd,snappy,zlib')
+MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+
+# MongoDB command monitoring: commands slower than this are logged, and each main
+# query's plan is explained at most once per interval per worker (0 disables)
+MONGO_SLOW_QUERY_MS = float(os.environ.get('MONGO_SLOW_QUERY_MS', '100'))
+MONGO_EXPLAIN_INTERVAL = float(os.environ.get('MONGO_EXPLAIN_INTERVAL', '300'))
+MONGO_EXPLAIN_MIN_EXAMINED = 1000
+MONGO_EXPLAIN_MAX_RATIO = 100
+
+# Driver housekeeping that is not worth timing
+UNMONITORED_COMMANDS = {'hello', 'ismaster', 'isMaster', 'ping', 'endSessions', 'saslStart',
+                        'saslContinue', 'buildInfo', 'getnonce', 'killCursors'}
+
+# Python packages that provide each wire compressor; zlib is always available
+COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': 'zlib'}
+
+# Module metadata cache (per worker); entries expire so other workers' changes show up
+MODULE_CACHE_TTL = int(os.environ.get('MODULE_CACHE_TTL', '60'))
+
+# Batch size for bulk backfills and IN (...) lookups
+BACKFILL_BATCH_SIZE = 500
+
+# SQLite user_version once the one-time image size backfill has run
+IMAGE_SIZE_SCHEMA_VERSION = 1
+
+# Rows fetched per round trip when a page is rendered straight from a live cursor
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', '50'))
+
+SEARCH_TOKEN_PATTERN = re.compile(r'\w+')
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+class DuplicateModuleError(Exception):
+    """Raised when a module with the same name already exists."""
+
+class ResultStream:
+    """Rows read lazily from a live database cursor, for templates rendered as a stream.
+
+    The first row is fetched up front so `{% if questions %}` still works; the
+    rest are only read as the template iterates, so memory does not grow with
+    the number of rows. A stream can be iterated once.
+    """
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.first = next(self.rows, None)
+
+    def __bool__(self):
+        return self.first is not None
+
+    def __iter__(self):
+        if self.first is not None:
+            first, self.first = self.first, None
+            yield first
+            yield from self.rows
+
+# Entities html.escape() produces, in the order that reverses it (&amp; last)
+HTML_ENTITIES = (('&lt;', '<'), ('&gt;', '>'), ('&quot;', '"'), ('&#x27;', "'"), ('&amp;', '&'))
+
+def sql_unescape(column):
+    """SQL expression undoing html.escape() on a column, usable inside triggers and views."""
+    for entity, char in HTML_ENTITIES:
+        column = "replace({}, '{}', '{}')".format(column, entity, char.replace("'", "''"))
+    return column
+
+def tokenize(text):
+    """Split text into lowercase search terms."""
+    return SEARCH_TOKEN_PATTERN.findall(html.unescape(text or '').lower())
+
+def build_search_terms(name, answer):
+    """Return the de-duplicated term list stored on a question for prefix search."""
+    return sorted(set(tokenize(name)) | set(tokenize(answer)))
+
+def encode_cursor(question):
+    """Encode a question's (created_at, id) sort key as an opaque URL-safe cursor."""
+    raw = f"{question['created_at']}|{question['id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a pagination cursor into (created_at, id string), or None if invalid."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, record_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return created_at, record_id
+    except (ValueError, TypeError):
+        return None
+
+def page_cursors(questions, page_size, cursor, backwards):
+    """Trim a page_size + 1 keyset fetch and work out its neighbouring cursors.
+
+    Returns (questions, next_cursor, prev_cursor) in newest-first order.
+    """
+    has_more = len(questions) > page_size
+    questions = questions[:page_size]
+
+    if backwards:
+        questions.reverse()
+        next_cursor = encode_cursor(questions[-1]) if questions else None
+        prev_cursor = encode_cursor(questions[0]) if questions and has_more else None
+    else:
+        next_cursor = encode_cursor(questions[-1]) if questions and has_more else None
+        prev_cursor = encode_cursor(questions[0]) if questions and cursor is not None else None
+
+    return questions, next_cursor, prev_cursor
+
+class Repository:
+    """Storage interface shared by the MongoDB and SQLite backends."""
+
+    name = None
+
+    def parse_id(self, value):
+        """Convert an id from a URL into the backend's id type, or None if malformed."""
+        raise NotImplementedError
+
+    def ping(self):
+        """Raise if the database cannot be reached."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release this process's connections (e.g. in the master before forking)."""
+
+    def pool_stats(self):
+        """Connection pool figures for /health."""
+        return {}
+
+    def query_stats(self):
+        """Per-command timings and sampled query plans for /health."""
+        return {}
+
+    # Modules
+
+    def list_modules(self):
+        """All modules, newest first, with question_count, image_bytes and last_updated."""
+        raise NotImplementedError
+
+    def get_module(self, module_id):
+        raise NotImplementedError
+
+    def create_module(self, name):
+        """Create a module and return its id; raises DuplicateModuleError."""
+        raise NotImplementedError
+
+    def count_module_questions(self, module_id):
+        raise NotImplementedError
+
+    def module_version(self, module_id):
+        """(last_modified, question_count) of a module's questions, or None if it does not exist.
+
+        Cheap enough to run before every module page to answer conditional GETs.
+        """
+        raise NotImplementedError
+
+    def delete_module(self, module_id):
+        """Delete a module and its questions.
+
+        Returns the image paths its questions used (for file cleanup), or None
+        if the module did not exist.
+        """
+        raise NotImplementedError
+
+    # Questions
+
+    def recent_questions(self, limit):
+        """The newest questions across all modules, with module_name."""
+        raise NotImplementedError
+
+    def module_questions(self, module_id):
+        """Every question in a module, newest first."""
+        raise NotImplementedError
+
+    def iter_module_questions(self, module_id):
+        """Like module_questions, but as a ResultStream read from a live cursor."""
+        return ResultStream(self.module_questions(module_id))
+
+    def list_questions(self, after=None, before=None, page_size=24):
+        """One keyset page of all questions; returns (questions, next_cursor, prev_cursor)."""
+        raise NotImplementedError
+
+    def search(self, search_query, module_id=None, prefix=False, page=1, page_size=24):
+        """Ranked, paginated search over names and answers; returns (questions, has_next)."""
+        raise NotImplementedError
+
+    def get_question(self, question_id):
+        """A question with module_name, or None."""
+        raise NotImplementedError
+
+    def question_version(self, question_id):
+        """(last_modified,) of a question, or None if it does not exist."""
+        raise NotImplementedError
+
+    def questions_version(self):
+        """(last_modified, question_count) across all questions."""
+        raise NotImplementedError
+
+    def add_question(self, module_id, name, image_path, image_size, answer, image_width=None, image_height=None):
+        """Insert a question and return its id; image_width/height are the decoded image size, if known."""
+        raise NotImplementedError
+
+    def update_question(self, question_id, name, answer):
+        """Update a question's name and answer; returns True if it changed."""
+        raise NotImplementedError
+
+    def delete_question(self, question_id):
+        """Delete a question and return it, or None if it did not exist."""
+        raise NotImplementedError
+
+    def referenced_images(self, filenames):
+        """Return the subset of filenames that some question still references."""
+        raise NotImplementedError
+
+def available_compressors(names=MONGO_COMPRESSORS):
+    """The requested wire compressors whose Python package is installed, in order."""
+    return [
+        name for name in (name.strip() for name in names.split(','))
+        if name in COMPRESSOR_MODULES and importlib.util.find_spec(COMPRESSOR_MODULES[name])
+    ]
+
+class PoolStats:
+    """Connection pool counters for one MongoClient, fed by PyMongo's CMAP events."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pools_cleared = 0
+
+    def listener(self):
+        from pymongo import monitoring
+        stats = self
+
+        class Listener(monitoring.ConnectionPoolListener):
+            def pool_created(self, event):
+                pass
+
+            def pool_ready(self, event):
+                pass
+
+            def pool_closed(self, event):
+                pass
+
+            def connection_ready(self, event):
+                pass
+
+            def connection_check_out_started(self, event):
+                pass
+
+            def pool_cleared(self, event):
+                stats.add(pools_cleared=1)
+
+            def connection_created(self, event):
+                stats.add(created=1, open=1)
+
+            def connection_closed(self, event):
+                stats.add(closed=1, open=-1)
+
+            def connection_checked_out(self, event):
+                stats.add(checkouts=1, in_use=1)
+
+            def connection_check_out_failed(self, event):
+                stats.add(checkout_failures=1)
+
+            def connection_checked_in(self, event):
+                stats.add(in_use=-1)
+
+        return Listener()
+
+    def add(self, **deltas):
+        with self.lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'open': self.open,
+                'in_use': self.in_use,
+                'created': self.created,
+                'closed': self.closed,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'pools_cleared': self.pools_cleared
+            }
+
+class CommandStats:
+    """Per-command, per-collection timings for one MongoClient, fed by PyMongo's command events.
+
+    Commands slower than MONGO_SLOW_QUERY_MS are logged with the filter or
+    pipeline that was sent. Each completed command is also passed to the
+    observers (e.g. the Prometheus histogram registered by metrics.py).
+    """
+
+    def __init__(self, observers=()):
+        self.lock = threading.Lock()
+        self.observers = observers
+        self.pending = {}
+        self.commands = {}
+
+    @staticmethod
+    def describe(event):
+        """(command, collection, query shape) of a started command."""
+        name, command = event.command_name, event.command
+        if name == 'explain' and isinstance(command.get('explain'), dict):
+            # Report explains under the command they explain, e.g. "explain find"
+            command = command['explain']
+            name = f"explain {next(iter(command))}"
+        collection = command.get('collection') if name == 'getMore' else command.get(name.split()[-1])
+        shape = command.get('filter', command.get('pipeline'))
+        return name, collection if isinstance(collection, str) else '', shape
+
+    def listener(self):
+        from pymongo import monitoring
+        stats = self
+
+        class Listener(monitoring.CommandListener):
+            def started(self, event):
+                if event.command_name not in UNMONITORED_COMMANDS:
+                    with stats.lock:
+                        stats.pending[(event.connection_id, event.request_id)] = stats.describe(event)
+
+            def succeeded(self, event):
+                stats.finish(event, failed=False)
+
+            def failed(self, event):
+                stats.finish(event, failed=True)
+
+        return Listener()
+
+    def finish(self, event, failed):
+        with self.lock:
+            started = self.pending.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        command, collection, shape = started
+        elapsed_ms = event.duration_micros / 1000
+        slow = elapsed_ms >= MONGO_SLOW_QUERY_MS
+
+        with self.lock:
+            entry = self.commands.setdefault(f"{command} {collection}".strip(), {
+                'count': 0, 'failed': 0, 'slow': 0, 'total_ms': 0.0, 'max_ms': 0.0
+            })
+            entry['count'] += 1
+            entry['failed'] += failed
+            entry['slow'] += slow
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+
+        if slow:
+            detail = f" {str(shape)[:200]}" if shape is not None else ''
+            print(f"🐢 Slow MongoDB {command} on {collection or '-'}: {elapsed_ms:.1f} ms{detail}")
+        for observer in self.observers:
+            observer(command, collection, elapsed_ms / 1000)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: dict(entry, total_ms=round(entry['total_ms'], 3), max_ms=round(entry['max_ms'], 3))
+                for name, entry in sorted(self.commands.items())
+            }
+
+def summarize_plan(explain):
+    """Stages, keys/documents examined and documents returned from an explain() result.
+
+    Works for find and aggregate explains, whose plans and executionStats are
+    nested at different depths.
+    """
+    summary = {'stages': set(), 'keys_examined': 0, 'docs_examined': 0, 'returned': 0}
+
+    def walk(node):
+        if isinstance(node, dict):
+            if isinstance(node.get('stage'), str):
+                summary['stages'].add(node['stage'])
+            if 'executionStats' in node and isinstance(node['executionStats'], dict):
+                stats = node['executionStats']
+                summary['keys_examined'] += stats.get('totalKeysExamined', 0)
+                summary['docs_examined'] += stats.get('totalDocsExamined', 0)
+                summary['returned'] += stats.get('nReturned', 0)
+            for key, value in node.items():
+                if key != 'allPlansExecution' and key != 'rejectedPlans':
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return summary
+
+class MongoRepository(Repository):
+    """MongoDB backend used by app.py"""
+
+    name = 'mongodb'
+
+    def __init__(self, uri, database_name, upload_folder=UPLOAD_FOLDER):
+        self.uri = uri
+        self.database_name = database_name
+        self.upload_folder = upload_folder
+        self.client = None
+        self.pid = None
+        self.stats = None
+        self.command_stats = None
+        self._db = None
+
+        # Called with (command, collection, seconds) for every monitored command
+        self.command_observers = []
+
+        # Query name -> monotonic time of its last explain() sample, and what it found
+        self.explained_at = {}
+        self.plan_samples = {}
+
+        # Module id -> module document, loaded lazily by get_module_map()
+        self.module_cache = None
+        self.module_cache_loaded_at = 0.0
+
+    def client_options(self):
+        """Keyword arguments for MongoClient, from the MONGO_* settings."""
+        options = {
+            'appname': 'quiz_partner',
+            'maxPoolSize': MONGO_MAX_POOL_SIZE,
+            'minPoolSize': MONGO_MIN_POOL_SIZE,
+            'maxIdleTimeMS': MONGO_MAX_IDLE_TIME_MS,
+            'connectTimeoutMS': MONGO_CONNECT_TIMEOUT_MS,
+            'socketTimeoutMS': MONGO_SOCKET_TIMEOUT_MS,
+            'waitQueueTimeoutMS': MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            'serverSelectionTimeoutMS': 10000,
+            'readPreference': MONGO_READ_PREFERENCE,
+            'event_listeners': [self.stats.listener(), self.command_stats.listener()]
+        }
+        compressors = available_compressors()
+        if compressors:
+            options['compressors'] = ','.join(compressors)
+        return options
+
+    def connect(self, create_indexes=True):
+        """Initialize MongoDB connection for this process.
+
+        PyMongo clients are not fork-safe, so each gunicorn worker creates its
+        own (see post_fork in gunicorn.conf.py); a client inherited from another
+        process is discarded rather than used.
+        """
+        from pymongo import MongoClient
+        from pymongo.errors import ConnectionFailure
+        if self._db is not None and self.pid == os.getpid():
+            return True
+        try:
+            print("🔗 Connecting to MongoDB...")
+            print(f"📍 URI: {self.uri[:60]}...")
+            print(f"📂 Database: {self.database_name}")
+            self.stats = PoolStats()
+            self.command_stats = CommandStats(self.command_observers)
+            self.client = MongoClient(self.uri, **self.client_options())
+            self.pid = os.getpid()
+            # Test connection
+            self.client.admin.command('ping')
+            self._db = self.client[self.database_name]
+
+            # Create indexes for better performance
+            if create_indexes:
+                self.create_indexes()
+
+            print("✅ MongoDB connection established!")
+            return True
+        except ConnectionFailure as e:
+            print(f"❌ Failed to connect to MongoDB: {e}")
+            print("💡 Make sure MongoDB is running and connection string is correct")
+            return False
+        except Exception as e:
+            print(f"❌ Unexpected error connecting to MongoDB: {e}")
+            return False
+
+    def close(self):
+        """Close this process's client; the next query reconnects."""
+        if self.client is not None and self.pid == os.getpid():
+            self.client.close()
+        self.client = None
+        self._db = None
+        self.invalidate_module_cache()
+
+    @property
+    def db(self):
+        """Get MongoDB database instance, connecting on first use in each process"""
+        if self._db is None or self.pid != os.getpid():
+            self._db = None
+            if not self.connect(create_indexes=False):
+                raise Exception("Could not connect to MongoDB")
+        return self._db
+
+    def pool_stats(self):
+        """Connection pool counters and client settings for /health."""
+        if self.client is None or self.pid != os.getpid():
+            return {'connected': False}
+        return {
+            'connected': True,
+            'pid': self.pid,
+            'max_pool_size': MONGO_MAX_POOL_SIZE,
+            'min_pool_size': MONGO_MIN_POOL_SIZE,
+            'compressors': available_compressors(),
+            'read_preference': MONGO_READ_PREFERENCE,
+            **self.stats.snapshot()
+        }
+
+    def query_stats(self):
+        """Command timings of this process's client and the latest sampled query plans."""
+        if self.command_stats is None or self.pid != os.getpid():
+            return {}
+        return {'commands': self.command_stats.snapshot(), 'plans': dict(self.plan_samples)}
+
+    def sample_explain(self, name, explain):
+        """Explain one of the routes' main queries, at most once per MONGO_EXPLAIN_INTERVAL.
+
+        explain is called on a background thread so the request is not delayed.
+        Plans that scan the whole collection, or examine far more documents than
+        they return, are logged.
+        """
+        now = time.monotonic()
+        last = self.explained_at.get(name)
+        if MONGO_EXPLAIN_INTERVAL <= 0 or (last is not None and now - last < MONGO_EXPLAIN_INTERVAL):
+            return
+        self.explained_at[name] = now
+        threading.Thread(target=self.check_plan, args=(name, explain), daemon=True).start()
+
+    def check_plan(self, name, explain):
+        try:
+            summary = summarize_plan(explain())
+        except Exception as e:
+            print(f"⚠️ Could not explain {name}: {e}")
+            return
+
+        summary['stages'] = sorted(summary['stages'])
+        self.plan_samples[name] = summary
+        examined, returned = summary['docs_examined'], summary['returned']
+        if 'COLLSCAN' in summary['stages']:
+            print(f"🔎 {name} scans the whole collection ({examined} documents examined, {returned} returned)")
+        elif examined >= MONGO_EXPLAIN_MIN_EXAMINED and examined > MONGO_EXPLAIN_MAX_RATIO * max(returned, 1):
+            print(f"🔎 {name} examines {examined} documents to return {returned}")
+
+    def create_indexes(self):
+        """Create database indexes for better performance"""
+        try:
+            # Modules collection indexes
+            self._db.modules.create_index("name", unique=True)
+            self._db.modules.create_index("created_at")
+
+            # Questions collection indexes
+            self._db.questions.create_index("module_id")
+            self._db.questions.create_index("name")
+            self._db.questions.create_index("created_at")
+            self._db.questions.create_index([("module_id", 1), ("created_at", -1)])
+            self._db.questions.create_index([("created_at", -1), ("_id", -1)])
+            self._db.questions.create_index("image_path")
+
+            # Full-text search: relevance-ranked text index plus a term index for prefix matching
+            self._db.questions.create_index(
+                [("name", "text"), ("answer", "text")],
+                weights={"name": 5, "answer": 1},
+                name="question_text_search"
+            )
+            self._db.questions.create_index("search_terms")
+            self.backfill_search_terms()
+            self.backfill_module_stats()
+            self.backfill_image_dimensions()
+
+            print("📊 Database indexes created successfully!")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not create indexes: {e}")
+
+    def backfill_search_terms(self):
+        """Populate search_terms on questions created before prefix search existed."""
+        from pymongo import UpdateOne
+        updates = []
+        for question in self._db.questions.find({"search_terms": {"$exists": False}}, {"name": 1, "answer": 1}):
+            updates.append(UpdateOne(
+                {"_id": question["_id"]},
+                {"$set": {"search_terms": build_search_terms(question.get("name"), question.get("answer"))}}
+            ))
+            if len(updates) >= BACKFILL_BATCH_SIZE:
+                self._db.questions.bulk_write(updates, ordered=False)
+                updates = []
+        if updates:
+            self._db.questions.bulk_write(updates, ordered=False)
+
+    def backfill_image_dimensions(self):
+        """Record the decoded width and height of images uploaded before they were stored."""
+        from pymongo import UpdateMany
+        from thumbnails import image_dimensions
+        updates = []
+        for image_path in self._db.questions.distinct("image_path", {"image_width": {"$exists": False}}):
+            width, height = image_dimensions(os.path.join(self.upload_folder, image_path or ''))
+            updates.append(UpdateMany(
+                {"image_path": image_path, "image_width": {"$exists": False}},
+                {"$set": {"image_width": width, "image_height": height}}
+            ))
+            if len(updates) >= BACKFILL_BATCH_SIZE:
+                self._db.questions.bulk_write(updates, ordered=False)
+                updates = []
+        if updates:
+            self._db.questions.bulk_write(updates, ordered=False)
+
+    def backfill_module_stats(self):
+        """Populate image sizes and denormalized module counters for pre-existing data.
+
+        Modules keep question_count, image_bytes and last_updated up to date as
+        questions are added, edited and deleted, so the dashboard never has to
+        count questions per module.
+        """
+        from pymongo import UpdateOne
+        updates = []
+        for question in self._db.questions.find({"image_size": {"$exists": False}}, {"image_path": 1}):
+            image_path = os.path.join(self.upload_folder, question.get("image_path") or '')
+            image_size = os.path.getsize(image_path) if os.path.isfile(image_path) else 0
+            updates.append(UpdateOne({"_id": question["_id"]}, {"$set": {"image_size": image_size}}))
+            if len(updates) >= BACKFILL_BATCH_SIZE:
+                self._db.questions.bulk_write(updates, ordered=False)
+                updates = []
+        if updates:
+            self._db.questions.bulk_write(updates, ordered=False)
+
+        module_ids = [module["_id"] for module in self._db.modules.find({"question_count": {"$exists": False}}, {"_id": 1})]
+        if not module_ids:
+            return
+
+        stats = {
+            row["_id"]: row for row in self._db.questions.aggregate([
+                {"$match": {"module_id": {"$in": module_ids}}},
+                {
+                    "$group": {
+                        "_id": "$module_id",
+                        "question_count": {"$sum": 1},
+                        "image_bytes": {"$sum": "$image_size"},
+                        "last_updated": {"$max": {"$ifNull": ["$updated_at", "$created_at"]}}
+                    }
+                }
+            ])
+        }
+        updates = []
+        for module_id in module_ids:
+            row = stats.get(module_id, {})
+            fields = {
+                "question_count": row.get("question_count", 0),
+                "image_bytes": row.get("image_bytes", 0)
+            }
+            if row.get("last_updated"):
+                fields["last_updated"] = row["last_updated"]
+            updates.append(UpdateOne({"_id": module_id}, {"$set": fields}))
+        self._db.modules.bulk_write(updates, ordered=False)
+
+    def parse_id(self, value):
+        from bson import ObjectId
+        from bson.errors import InvalidId
+        try:
+            return ObjectId(value)
+        except (InvalidId, TypeError):
+            return None
+
+    def ping(self):
+        self.db.command('ping')
+
+    @staticmethod
+    def with_id(doc):
+        """Expose a document's _id as the 'id' the templates link with."""
+        if doc is not None:
+            doc['id'] = str(doc['_id'])
+        return doc
+
+    def get_module_map(self, required_ids=()):
+        """Return the cached {module _id: module document} map for this worker.
+
+        The map is reloaded when it is older than MODULE_CACHE_TTL or when one of
+        required_ids is missing, which covers modules created by another worker.
+        """
+        expired = time.monotonic() - self.module_cache_loaded_at > MODULE_CACHE_TTL
+        if self.module_cache is None or expired or any(module_id not in self.module_cache for module_id in required_ids):
+            self.module_cache = {module['_id']: module for module in self.db.modules.find({}, {"name": 1, "created_at": 1})}
+            self.module_cache_loaded_at = time.monotonic()
+        return self.module_cache
+
+    def invalidate_module_cache(self):
+        """Drop the module cache so the next lookup reloads it."""
+        self.module_cache = None
+
+    def attach_module_info(self, questions):
+        """Attach module_info and module_name to each question from the module cache.
+
+        Questions whose module no longer exists are dropped, matching the old
+        $lookup + $unwind behaviour.
+        """
+        modules = self.get_module_map({question['module_id'] for question in questions})
+        attached = []
+        for question in questions:
+            module = modules.get(question['module_id'])
+            if module is None:
+                continue
+            question['module_info'] = module
+            question['module_name'] = module['name']
+            attached.append(self.with_id(question))
+        return attached
+
+    def list_modules(self):
+        return [self.with_id(module) for module in self.db.modules.find().sort("created_at", -1)]
+
+    def get_module(self, module_id):
+        return self.with_id(self.db.modules.find_one({"_id": module_id}))
+
+    def create_module(self, name):
+        from pymongo.errors import DuplicateKeyError
+        module_doc = {
+            'name': name,
+            'question_count': 0,
+            'image_bytes': 0,
+            'created_at': datetime.utcnow().isoformat()
+        }
+        try:
+            result = self.db.modules.insert_one(module_doc)
+        except DuplicateKeyError:
+            raise DuplicateModuleError(name)
+        self.invalidate_module_cache()
+        return result.inserted_id
+
+    def count_module_questions(self, module_id):
+        return self.db.questions.count_documents({"module_id": module_id})
+
+    def module_version(self, module_id):
+        # The module document already carries the denormalized counters
+        module = self.db.modules.find_one({"_id": module_id}, {"question_count": 1, "last_updated": 1})
+        if module is None:
+            return None
+        return module.get("last_updated"), module.get("question_count", 0)
+
+    def delete_module(self, module_id):
+        # Collect the image files referenced by this module's questions (image_path only)
+        image_paths = [
+            question['image_path']
+            for question in self.db.questions.find({"module_id": module_id}, {"image_path": 1, "_id": 0})
+        ]
+
+        # Delete all questions in this module, then the module
+        self.db.questions.delete_many({"module_id": module_id})
+        result = self.db.modules.delete_one({"_id": module_id})
+        self.invalidate_module_cache()
+        return image_paths if result.deleted_count > 0 else None
+
+    def recent_questions(self, limit):
+        cursor = self.db.questions.find().sort("created_at", -1).limit(limit)
+        self.sample_explain('recent_questions', lambda: cursor.clone().explain())
+        return self.attach_module_info(list(cursor))
+
+    def module_questions(self, module_id):
+        cursor = self.db.questions.find({"module_id": module_id}).sort("created_at", -1)
+        self.sample_explain('module_questions', lambda: cursor.clone().explain())
+        return [self.with_id(question) for question in cursor]
+
+    def iter_module_questions(self, module_id):
+        cursor = self.db.questions.find({"module_id": module_id}).sort("created_at", -1).batch_size(STREAM_BATCH_SIZE)
+        return ResultStream(self.with_id(question) for question in cursor)
+
+    def list_questions(self, after=None, before=None, page_size=24):
+        """Fetch one page of questions using keyset pagination on (created_at, _id).
+
+        Only page_size + 1 documents are read from the (created_at, _id) index, and
+        module names come from the module cache, so the cost of a page does not depend
+        on the size of the collection.
+        """
+        cursor = decode_cursor(before or after or '')
+        if cursor is not None and self.parse_id(cursor[1]) is None:
+            cursor = None
+        backwards = cursor is not None and bool(before)
+        direction = 1 if backwards else -1
+        operator = "$gt" if backwards else "$lt"
+
+        pipeline = []
+        if cursor is not None:
+            created_at, object_id = cursor[0], self.parse_id(cursor[1])
+            pipeline.append({
+                "$match": {
+                    "$or": [
+                        {"created_at": {operator: created_at}},
+                        {"created_at": created_at, "_id": {operator: object_id}}
+                    ]
+                }
+            })
+        pipeline.extend([
+            {
+                "$sort": {"created_at": direction, "_id": direction}
+            },
+            {
+                "$limit": page_size + 1
+            }
+        ])
+
+        self.sample_explain('list_questions', lambda: self.db.command({
+            'explain': {'aggregate': 'questions', 'pipeline': pipeline, 'cursor': {}},
+            'verbosity': 'executionStats'
+        }))
+        questions = [self.with_id(question) for question in self.db.questions.aggregate(pipeline)]
+        questions, next_cursor, prev_cursor = page_cursors(questions, page_size, cursor, backwards)
+        return self.attach_module_info(questions), next_cursor, prev_cursor
+
+    def search(self, search_query, module_id=None, prefix=False, page=1, page_size=24):
+        """Run a paginated question search.
+
+        The default mode uses the text index and ranks by relevance (name matches weigh
+        more than answer matches). Prefix mode matches every query word as a prefix of an
+        indexed term and ranks by recency. User input is never used as a regex pattern.
+        """
+        query = {"module_id": module_id} if module_id is not None else {}
+
+        if prefix:
+            terms = tokenize(search_query)
+            if not terms:
+                return [], False
+            query["$and"] = [{"search_terms": {"$regex": "^" + re.escape(term)}} for term in terms]
+            cursor = self.db.questions.find(query).sort([("created_at", -1), ("_id", -1)])
+        else:
+            query["$text"] = {"$search": search_query}
+            cursor = self.db.questions.find(query, {"score": {"$meta": "textScore"}}).sort(
+                [("score", {"$meta": "textScore"}), ("created_at", -1)]
+            )
+
+        cursor = cursor.skip((page - 1) * page_size).limit(page_size + 1)
+        self.sample_explain('prefix_search' if prefix else 'search', lambda: cursor.clone().explain())
+        questions = list(cursor)
+        return self.attach_module_info(questions[:page_size]), len(questions) > page_size
+
+    def get_question(self, question_id):
+        question = self.db.questions.find_one({"_id": question_id})
+        questions = self.attach_module_info([question] if question else [])
+        return questions[0] if questions else None
+
+    def question_version(self, question_id):
+        question = self.db.questions.find_one({"_id": question_id}, {"created_at": 1, "updated_at": 1})
+        if question is None:
+            return None
+        return (question.get("updated_at") or question.get("created_at"),)
+
+    def questions_version(self):
+        # Summed from the small modules collection instead of scanning questions
+        last_modified, question_count = None, 0
+        for module in self.db.modules.find({}, {"question_count": 1, "last_updated": 1, "_id": 0}):
+            question_count += module.get("question_count", 0)
+            if module.get("last_updated") and (last_modified is None or module["last_updated"] > last_modified):
+                last_modified = module["last_updated"]
+        return last_modified, question_count
+
+    def add_question(self, module_id, name, image_path, image_size, answer, image_width=None, image_height=None):
+        created_at = datetime.utcnow().isoformat()
+        result = self.db.questions.insert_one({
+            'module_id': module_id,
+            'name': name,
+            'image_path': image_path,
+            'image_size': image_size,
+            'image_width': image_width,
+            'image_height': image_height,
+            'answer': answer,
+            'search_terms': build_search_terms(name, answer),
+            'created_at': created_at
+        })
+
+        # Keep the dashboard's module counters current
+        self.db.modules.update_one(
+            {"_id": module_id},
+            {
+                "$inc": {"question_count": 1, "image_bytes": image_size},
+                "$max": {"last_updated": created_at}
+            }
+        )
+        return result.inserted_id
+
+    def update_question(self, question_id, name, answer):
+        updated_at = datetime.utcnow().isoformat()
+        question = self.db.questions.find_one_and_update(
+            {"_id": question_id, "$or": [{"name": {"$ne": name}}, {"answer": {"$ne": answer}}]},
+            {
+                "$set": {
+                    "answer": answer,
+                    "name": name,
+                    "search_terms": build_search_terms(name, answer),
+                    "updated_at": updated_at
+                }
+            },
+            projection={"module_id": 1}
+        )
+        if question is None:
+            return False
+        self.db.modules.update_one({"_id": question['module_id']}, {"$max": {"last_updated": updated_at}})
+        return True
+
+    def delete_question(self, question_id):
+        question = self.db.questions.find_one_and_delete({"_id": question_id})
+        if question is None:
+            return None
+        self.db.modules.update_one(
+            {"_id": question['module_id']},
+            {"$inc": {"question_count": -1, "image_bytes": -question.get('image_size', 0)}}
+        )
+        return self.with_id(question)
+
+    def referenced_images(self, filenames):
+        return set(self.db.questions.distinct("image_path", {"image_path": {"$in": list(filenames)}}))
+
+class SQLiteConnectionPool:
+    """Per-process pool of configured SQLite connections.
+
+    Connections are opened on demand, get their pragmas once, and are kept
+    (up to max_idle) for reuse instead of being reopened on every request.
+    Read-only pools open the database with mode=ro, so GET traffic can never
+    take the write lock. A pool created before a fork is never shared with
+    the child: the first checkout in a new process starts from empty.
+    """
+
+    def __init__(self, path, readonly=False, max_idle=SQLITE_POOL_SIZE):
+        self.path = path
+        self.readonly = readonly
+        self.max_idle = max_idle
+        self.lock = threading.Lock()
+        self.idle = []
+        self.pid = os.getpid()
+
+    def open(self):
+        if self.readonly:
+            conn = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True,
+                                   timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size = {SQLITE_MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Check a connection out for the duration of a with-block."""
+        with self.lock:
+            if self.pid != os.getpid():
+                # Forked: connections inherited from the parent must not be used
+                self.idle, self.pid = [], os.getpid()
+            conn = self.idle.pop() if self.idle else None
+        if conn is None:
+            conn = self.open()
+
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self.lock:
+                if self.pid == os.getpid() and len(self.idle) < self.max_idle:
+                    self.idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self.lock:
+            return {'idle': len(self.idle) if self.pid == os.getpid() else 0, 'max_idle': self.max_idle}
+
+class SQLiteRepository(Repository):
+    """SQLite backend used by app_sqlite_with_auth.py"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=SQLITE_PATH, upload_folder=UPLOAD_FOLDER):
+        self.path = path
+        self.upload_folder = upload_folder
+        self.write_pool = SQLiteConnectionPool(path)
+        self.read_pool = SQLiteConnectionPool(path, readonly=True)
+
+    def connection(self, readonly=False):
+        """Borrow a pooled connection; reads use the read-only pool."""
+        return (self.read_pool if readonly else self.write_pool).connection()
+
+    def close(self):
+        self.write_pool.close()
+        self.read_pool.close()
+
+    def pool_stats(self):
+        return {'read': self.read_pool.stats(), 'write': self.write_pool.stats()}
+
+    def init_schema(self):
+        """Initialize the SQLite database with required tables."""
+        conn = sqlite3.connect(self.path)
+        cursor = conn.cursor()
+
+        # WAL lets readers carry on while a writer commits; the mode is stored in the file
+        cursor.execute('PRAGMA journal_mode = WAL')
+
+        # Create modules table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS modules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Create questions table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                module_id INTEGER NOT NULL,
+                name TEXT NOT NULL DEFAULT 'Untitled Question',
+                image_path TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (module_id) REFERENCES modules (id) ON DELETE CASCADE
+            )
+        ''')
+
+        # Add name column to existing questions table if it doesn't exist
+        try:
+            cursor.execute('ALTER TABLE questions ADD COLUMN name TEXT NOT NULL DEFAULT "Untitled Question"')
+        except sqlite3.OperationalError:
+            # Column already exists
+            pass
+
+        # Add image size and edit tracking columns used by the dashboard module stats, and the
+        # decoded image dimensions listing pages use to reserve space for lazily loaded images
+        for column in ('image_size INTEGER NOT NULL DEFAULT 0', 'updated_at TIMESTAMP',
+                       'image_width INTEGER', 'image_height INTEGER'):
+            try:
+                cursor.execute(f'ALTER TABLE questions ADD COLUMN {column}')
+            except sqlite3.OperationalError:
+                # Column already exists
+                pass
+
+        # Backfill image sizes for questions uploaded before they were recorded. This runs once,
+        # tracked in user_version: a size of 0 can't tell an unsized row from a missing file
+        if cursor.execute('PRAGMA user_version').fetchone()[0] < IMAGE_SIZE_SCHEMA_VERSION:
+            missing_sizes = cursor.execute(
+                'SELECT id, image_path FROM questions WHERE image_size = 0'
+            ).fetchall()
+            sizes = []
+            for question_id, image_path in missing_sizes:
+                file_path = os.path.join(self.upload_folder, image_path)
+                if os.path.isfile(file_path):
+                    sizes.append((os.path.getsize(file_path), question_id))
+            cursor.executemany('UPDATE questions SET image_size = ? WHERE id = ?', sizes)
+            cursor.execute(f'PRAGMA user_version = {IMAGE_SIZE_SCHEMA_VERSION}')
+
+        # Backfill image dimensions once per (shared) image file. NULL means not computed yet;
+        # images that can't be read are recorded as 0x0 so they aren't retried on every start
+        from thumbnails import image_dimensions
+        missing_dimensions = cursor.execute(
+            'SELECT DISTINCT image_path FROM questions WHERE image_width IS NULL'
+        ).fetchall()
+        dimensions = []
+        for (image_path,) in missing_dimensions:
+            width, height = image_dimensions(os.path.join(self.upload_folder, image_path))
+            dimensions.append((width or 0, height or 0, image_path))
+        cursor.executemany(
+            'UPDATE questions SET image_width = ?, image_height = ? WHERE image_path = ? AND image_width IS NULL',
+            dimensions
+        )
+
+        # Indexes for the recent-questions feed, keyset pages, per-module lookups and page versions
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_created_at ON questions (created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_module_created ON questions (module_id, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_image_path ON questions (image_path)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_updated_at ON questions (updated_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_questions_module_updated ON questions (module_id, updated_at)')
+
+        # Create full-text search index over question names and answers. Questions are stored
+        # HTML-escaped, so the index reads them through a view that unescapes them; otherwise
+        # entity fragments ("x27") would be searchable and snippets escaped twice.
+        fts_sql = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'questions_fts'"
+        ).fetchone()
+        if fts_sql and 'questions_search_text' not in fts_sql[0]:
+            # Index created before the unescaping view; rebuild it
+            cursor.executescript('''
+                DROP TRIGGER IF EXISTS questions_fts_insert;
+                DROP TRIGGER IF EXISTS questions_fts_delete;
+                DROP TRIGGER IF EXISTS questions_fts_update;
+                DROP TABLE questions_fts;
+            ''')
+            fts_sql = None
+        cursor.execute(f'''
+            CREATE VIEW IF NOT EXISTS questions_search_text AS
+            SELECT id, {sql_unescape('name')} AS name, {sql_unescape('answer')} AS answer FROM questions
+        ''')
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+                name,
+                answer,
+                content='questions_search_text',
+                content_rowid='id',
+                tokenize='unicode61'
+            )
+        ''')
+
+        # Keep the search index in sync with the questions table
+        old_values = f"old.id, {sql_unescape('old.name')}, {sql_unescape('old.answer')}"
+        new_values = f"new.id, {sql_unescape('new.name')}, {sql_unescape('new.answer')}"
+        cursor.executescript(f'''
+            CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+                INSERT INTO questions_fts (rowid, name, answer) VALUES ({new_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+                INSERT INTO questions_fts (questions_fts, rowid, name, answer) VALUES ('delete', {old_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS questions_fts_update AFTER UPDATE OF name, answer ON questions BEGIN
+                INSERT INTO questions_fts (questions_fts, rowid, name, answer) VALUES ('delete', {old_values});
+                INSERT INTO questions_fts (rowid, name, answer) VALUES ({new_values});
+            END;
+        ''')
+
+        # Backfill the index for questions created before it existed
+        if not fts_sql:
+            cursor.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+
+        conn.commit()
+        conn.close()
+
+    def query(self, sql, params=()):
+        """Run a read query on a read-only connection and return its rows as dicts."""
+        with self.connection(readonly=True) as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def query_one(self, sql, params=()):
+        rows = self.query(sql, params)
+        return rows[0] if rows else None
+
+    def parse_id(self, value):
+        try:
+            return int(value)
+        except (ValueError, TypeError):
+            return None
+
+    def ping(self):
+        self.query('SELECT 1')
+
+    def list_modules(self):
+        # Modules with their question counts and stats, grouped in a single query
+        return self.query('''
+            SELECT m.*,
+                   COUNT(q.id) as question_count,
+                   COALESCE(SUM(q.image_size), 0) as image_bytes,
+                   MAX(COALESCE(q.updated_at, q.created_at)) as last_updated
+            FROM modules m
+            LEFT JOIN questions q ON q.module_id = m.id
+            GROUP BY m.id
+            ORDER BY m.created_at DESC
+        ''')
+
+    def get_module(self, module_id):
+        return self.query_one('SELECT * FROM modules WHERE id = ?', (module_id,))
+
+    def create_module(self, name):
+        with self.connection() as conn:
+            try:
+                cursor = conn.execute('INSERT INTO modules (name) VALUES (?)', (name,))
+                conn.commit()
+                return cursor.lastrowid
+            except sqlite3.IntegrityError:
+                raise DuplicateModuleError(name)
+
+    def count_module_questions(self, module_id):
+        return self.query_one(
+            'SELECT COUNT(*) as count FROM questions WHERE module_id = ?', (module_id,)
+        )['count']
+
+    def module_version(self, module_id):
+        # Each MAX() is answered from its (module_id, ...) index; COUNT(*) scans the module's entries
+        # in one of them. MAX(COALESCE(updated_at, created_at)) would read every row of the module.
+        row = self.query_one('''
+            SELECT (SELECT MAX(created_at) FROM questions WHERE module_id = ?) as last_created,
+                   (SELECT MAX(updated_at) FROM questions WHERE module_id = ?) as last_updated,
+                   (SELECT COUNT(*) FROM questions WHERE module_id = ?) as question_count
+            FROM modules
+            WHERE id = ?
+        ''', (module_id, module_id, module_id, module_id))
+        if row is None:
+            return None
+        return max(row['last_created'] or '', row['last_updated'] or '') or None, row['question_count']
+
+    def delete_module(self, module_id):
+        with self.connection() as conn:
+            # Collect the image files referenced by this module's questions
+            image_paths = [row['image_path'] for row in conn.execute(
+                'SELECT DISTINCT image_path FROM questions WHERE module_id = ?', (module_id,)
+            ).fetchall()]
+
+            # Delete module (CASCADE will delete questions)
+            deleted = conn.execute('DELETE FROM modules WHERE id = ?', (module_id,)).rowcount
+            conn.commit()
+            return image_paths if deleted else None
+
+    def recent_questions(self, limit):
+        return self.query('''
+            SELECT q.id, q.name, q.image_path, q.created_at, m.name as module_name, m.id as module_id
+            FROM questions q
+            JOIN modules m ON q.module_id = m.id
+            ORDER BY q.created_at DESC
+            LIMIT ?
+        ''', (limit,))
+
+    def module_questions(self, module_id):
+        return self.query(
+            'SELECT * FROM questions WHERE module_id = ? ORDER BY created_at DESC',
+            (module_id,)
+        )
+
+    def iter_module_questions(self, module_id):
+        def rows():
+            # The read connection stays checked out until the page has been sent
+            with self.connection(readonly=True) as conn:
+                cursor = conn.execute(
+                    'SELECT * FROM questions WHERE module_id = ? ORDER BY created_at DESC', (module_id,)
+                )
+                try:
+                    for batch in iter(lambda: cursor.fetchmany(STREAM_BATCH_SIZE), []):
+                        for row in batch:
+                            yield dict(row)
+                finally:
+                    cursor.close()
+        return ResultStream(rows())
+
+    def list_questions(self, after=None, before=None, page_size=24):
+        """Fetch one page of questions using keyset pagination on (created_at, id)."""
+        cursor = decode_cursor(before or after or '')
+        if cursor is not None and self.parse_id(cursor[1]) is None:
+            cursor = None
+        backwards = cursor is not None and bool(before)
+        direction = 'ASC' if backwards else 'DESC'
+        operator = '>' if backwards else '<'
+
+        sql = '''
+            SELECT q.*, m.name as module_name, m.id as module_id
+            FROM questions q
+            JOIN modules m ON q.module_id = m.id
+        '''
+        params = []
+        if cursor is not None:
+            sql += f' WHERE (q.created_at, q.id) {operator} (?, ?)'
+            params.extend([cursor[0], self.parse_id(cursor[1])])
+        sql += f' ORDER BY q.created_at {direction}, q.id {direction} LIMIT ?'
+        params.append(page_size + 1)
+
+        return page_cursors(self.query(sql, params), page_size, cursor, backwards)
+
+    @staticmethod
+    def build_fts_query(search_query, prefix=False):
+        """Turn free-form user input into a safe FTS5 MATCH expression.
+
+        Every word is quoted so FTS5 operators in the input are treated as text;
+        all words must match, and in prefix mode each word matches as a prefix.
+        """
+        terms = SEARCH_TOKEN_PATTERN.findall(search_query)
+        suffix = '*' if prefix else ''
+        return ' '.join(f'"{term}"{suffix}' for term in terms)
+
+    @staticmethod
+    def highlight_snippet(snippet):
+        """Escape an FTS5 snippet (taken from unescaped text) once and turn its match markers into <mark> tags."""
+        if not snippet:
+            return ''
+        return Markup(str(escape(snippet)).replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>'))
+
+    def search(self, search_query, module_id=None, prefix=False, page=1, page_size=24):
+        """Run a ranked, paginated FTS5 search over question names and answers.
+
+        Results are ordered by bm25 with name matches weighted above answer matches and
+        carry a highlighted answer snippet.
+        """
+        match = self.build_fts_query(search_query, prefix)
+        if not match:
+            return [], False
+
+        sql = f'''
+            SELECT q.*, m.name as module_name, m.id as module_id,
+                   snippet(questions_fts, 1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16) as snippet
+            FROM questions_fts
+            JOIN questions q ON q.id = questions_fts.rowid
+            JOIN modules m ON q.module_id = m.id
+            WHERE questions_fts MATCH ?
+        '''
+        params = [match]
+        if module_id is not None:
+            sql += ' AND q.module_id = ?'
+            params.append(module_id)
+        sql += ' ORDER BY bm25(questions_fts, 5.0, 1.0), q.created_at DESC LIMIT ? OFFSET ?'
+        params.extend([page_size + 1, (page - 1) * page_size])
+
+        rows = self.query(sql, params)
+        questions = [dict(row, snippet=self.highlight_snippet(row['snippet'])) for row in rows[:page_size]]
+        return questions, len(rows) > page_size
+
+    def get_question(self, question_id):
+        return self.query_one('''
+            SELECT q.*, m.name as module_name, m.id as module_id
+            FROM questions q
+            JOIN modules m ON q.module_id = m.id
+            WHERE q.id = ?
+        ''', (question_id,))
+
+    def question_version(self, question_id):
+        row = self.query_one('''
+            SELECT COALESCE(q.updated_at, q.created_at) as last_modified
+            FROM questions q
+            JOIN modules m ON q.module_id = m.id
+            WHERE q.id = ?
+        ''', (question_id,))
+        return (row['last_modified'],) if row else None
+
+    def questions_version(self):
+        # Each MAX() is answered from its index; COUNT(*) scans the smallest index
+        row = self.query_one('''
+            SELECT (SELECT MAX(created_at) FROM questions) as last_created,
+                   (SELECT MAX(updated_at) FROM questions) as last_updated,
+                   (SELECT COUNT(*) FROM questions) as question_count
+        ''')
+        return max(row['last_created'] or '', row['last_updated'] or '') or None, row['question_count']
+
+    def add_question(self, module_id, name, image_path, image_size, answer, image_width=None, image_height=None):
+        with self.connection() as conn:
+            cursor = conn.execute(
+                'INSERT INTO questions (module_id, name, image_path, image_size, image_width, image_height, answer) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (module_id, name, image_path, image_size, image_width, image_height, answer)
+            )
+            conn.commit()
+            return cursor.lastrowid
+
+    def update_question(self, question_id, name, answer):
+        with self.connection() as conn:
+            updated = conn.execute(
+                "UPDATE questions SET answer = ?, name = ?, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = ?",
+                (answer, name, question_id)
+            ).rowcount
+            conn.commit()
+            return updated > 0
+
+    def delete_question(self, question_id):
+        with self.connection() as conn:
+            question = conn.execute('SELECT * FROM questions WHERE id = ?', (question_id,)).fetchone()
+            if question is None:
+                return None
+            conn.execute('DELETE FROM questions WHERE id = ?', (question_id,))
+            conn.commit()
+            return dict(question)
+
+    def referenced_images(self, filenames):
+        filenames = list(set(filenames))
+        still_referenced = set()
+        for start in range(0, len(filenames), BACKFILL_BATCH_SIZE):
+            batch = filenames[start:start + BACKFILL_BATCH_SIZE]
+            placeholders = ', '.join('?' * len(batch))
+            rows = self.query(
+                f'SELECT DISTINCT image_path FROM questions WHERE image_path IN ({placeholders})', batch
+            )
+            still_referenced.update(row['image_path'] for row in rows)
+        return still_referenced
+
+def create_repository(backend=STORAGE_BACKEND, mongodb_uri=None, database_name=None, sqlite_path=SQLITE_PATH,
+                      upload_folder=UPLOAD_FOLDER):
+    """Build the repository for the configured backend."""
+    if backend == 'mongodb':
+        return MongoRepository(mongodb_uri, database_name, upload_folder)
+    if backend == 'sqlite':
+        return SQLiteRepository(sqlite_path, upload_folder)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; expected 'mongodb' or 'sqlite'")
@@ -0,0 +1,52 @@
+"""
+Streamed rendering for the large listing pages
+The answers and all-questions pages are sent to the browser while Jinja is
+still generating them, so the first bytes (header, search form, first
+questions) arrive before the last question has been read from the database,
+and a worker never holds the whole rendered page in memory.
+"""
+
+import os
+from flask import current_app, g, get_flashed_messages, stream_with_context
+from flask.signals import before_render_template, template_rendered
+
+# Template output pieces joined into one chunk before it is written to the socket
+STREAM_BUFFER_ITEMS = int(os.environ.get('STREAM_BUFFER_ITEMS', '32'))
+
+# Appended to a page whose rendering failed after the response had started
+STREAM_ERROR_HTML = (
+    '<div class="flash-messages"><div class="flash-message flash-error">'
+    'This page could not be loaded completely. Please reload it.</div></div>'
+)
+
+def stream_page(template_name, **context):
+    """Render a template to the client chunk by chunk as it is generated.
+
+    Flashed messages are taken from the session before the first byte is sent:
+    once streaming has started the session cookie can no longer be updated, and
+    a message only popped while rendering would be shown again on the next page.
+
+    The 200 status is sent before the rows are read, so an error while rendering
+    (e.g. a dropped database cursor) can't become an error page: it is logged,
+    the page ends with a notice, and g.stream_failed tells the metrics about it.
+    """
+    get_flashed_messages(with_categories=True)
+
+    app = current_app._get_current_object()
+    template = app.jinja_env.get_or_select_template(template_name)
+    app.update_template_context(context)
+    before_render_template.send(app, _async_wrapper=app.ensure_sync, template=template, context=context)
+
+    def generate():
+        try:
+            stream = template.stream(context)
+            stream.enable_buffering(STREAM_BUFFER_ITEMS)
+            yield from stream
+        except Exception as e:
+            print(f"❌ Error while streaming {template_name}: {e}")
+            g.stream_failed = True
+            yield STREAM_ERROR_HTML
+            return
+        template_rendered.send(app, _async_wrapper=app.ensure_sync, template=template, context=context)
+
+    return app.response_class(stream_with_context(generate()), mimetype='text/html')
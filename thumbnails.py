@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Thumbnail generation for uploaded question images
+Creates resized copies of uploads at several widths for listing pages (served
+through srcset, so browsers pick the smallest that fits) and backfills existing ones
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from flask import g, url_for
+from PIL import Image, ImageOps
+from upload_storage import send_upload
+
+# Configuration
+UPLOAD_FOLDER = 'uploads'
+THUMBNAIL_FOLDER = os.path.join(UPLOAD_FOLDER, 'thumbnails')
+THUMBNAIL_WIDTH = int(os.environ.get('THUMBNAIL_WIDTH', '640'))
+# Widths offered in srcset; THUMBNAIL_WIDTH is always one of them and is the src fallback
+THUMBNAIL_WIDTHS = sorted({THUMBNAIL_WIDTH} | {
+    int(width) for width in os.environ.get('THUMBNAIL_WIDTHS', '320,640,1280').split(',') if width.strip()
+})
+THUMBNAIL_FORMAT = os.environ.get('THUMBNAIL_FORMAT', 'webp').lower()
+THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', '80'))
+# Thumbnails are rewritten in place by --force, so they are revalidated rather than immutable
+THUMBNAIL_CACHE_MAX_AGE = int(os.environ.get('THUMBNAIL_CACHE_MAX_AGE', str(24 * 60 * 60)))
+# Listing pages remember which thumbnails exist instead of checking the disk on every render;
+# images still missing some are re-checked after THUMBNAIL_LOOKUP_TTL seconds
+THUMBNAIL_LOOKUP_SIZE = int(os.environ.get('THUMBNAIL_LOOKUP_SIZE', '20000'))
+THUMBNAIL_LOOKUP_TTL = float(os.environ.get('THUMBNAIL_LOOKUP_TTL', '60'))
+
+THUMBNAIL_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
+
+# EXIF orientations that rotate the image by 90 degrees, swapping width and height
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+def thumbnail_name(filename, width=THUMBNAIL_WIDTH):
+    """Return the thumbnail filename for an uploaded image."""
+    stem = filename.rsplit('.', 1)[0]
+    return f"{stem}_{width}.{THUMBNAIL_EXTENSIONS[THUMBNAIL_FORMAT]}"
+
+def displayed_size(image):
+    """Size of an opened image once its EXIF rotation is applied, without decoding it."""
+    width, height = image.size
+    if image.getexif().get(0x0112) in ROTATED_ORIENTATIONS:
+        return height, width
+    return width, height
+
+def image_dimensions(image_path):
+    """Return the displayed (width, height) of an image, or (None, None) if it can't be read.
+
+    Only the header is decoded. EXIF rotation is applied, as it is for thumbnails.
+    """
+    try:
+        with Image.open(image_path) as image:
+            return displayed_size(image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None, None
+
+def thumbnail_widths(image_width):
+    """Thumbnail widths generated for an image: those narrower than it, plus THUMBNAIL_WIDTH."""
+    return [width for width in THUMBNAIL_WIDTHS if width < image_width or width == THUMBNAIL_WIDTH]
+
+class ThumbnailLookup:
+    """Thread-safe per-worker LRU of the thumbnail widths on disk: filename -> (widths, present, expires).
+
+    Thumbnails are only removed together with the image, so once every width
+    exists the entry is kept until evicted. Incomplete entries expire, as the
+    missing thumbnails may be written by another worker or the backfill.
+    """
+
+    def __init__(self, max_entries=THUMBNAIL_LOOKUP_SIZE, ttl=THUMBNAIL_LOOKUP_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def present(self, filename, widths, thumbnail_folder=THUMBNAIL_FOLDER):
+        """Those of widths whose thumbnail of filename exists."""
+        widths = tuple(widths)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(filename)
+            if entry is not None and set(widths) <= set(entry[0]) and entry[2] > now:
+                self.entries.move_to_end(filename)
+                return tuple(width for width in entry[1] if width in widths)
+
+        present = tuple(width for width in widths
+                        if os.path.exists(os.path.join(thumbnail_folder, thumbnail_name(filename, width))))
+        expires = float('inf') if len(present) == len(widths) else now + self.ttl
+        with self.lock:
+            self.entries[filename] = (widths, present, expires)
+            self.entries.move_to_end(filename)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return present
+
+    def invalidate(self, filename):
+        with self.lock:
+            self.entries.pop(filename, None)
+
+# Thumbnails known to exist, for thumbnail_url and thumbnail_image
+thumbnail_lookup = ThumbnailLookup()
+
+def create_thumbnails(image_path, thumbnail_folder=THUMBNAIL_FOLDER, widths=None, skip_existing=False):
+    """Write resized copies of image_path at each width and return their filenames.
+
+    The image is decoded once for all widths. By default every width in
+    thumbnail_widths() is written; images narrower than THUMBNAIL_WIDTH are
+    re-encoded at their own size, which still shrinks large PNG screenshots
+    considerably.
+    """
+    os.makedirs(thumbnail_folder, exist_ok=True)
+    written = []
+
+    with Image.open(image_path) as original:
+        names = {
+            width: thumbnail_name(os.path.basename(image_path), width)
+            for width in widths or thumbnail_widths(displayed_size(original)[0])
+        }
+        if skip_existing:
+            names = {width: name for width, name in names.items()
+                     if not os.path.exists(os.path.join(thumbnail_folder, name))}
+        if not names:
+            return written
+
+        image = ImageOps.exif_transpose(original)
+        if THUMBNAIL_FORMAT == 'jpeg' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB' if THUMBNAIL_FORMAT == 'jpeg' else 'RGBA')
+
+        for width, filename in names.items():
+            resized = image
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.LANCZOS)
+
+            # Write to a temporary name first so readers never see a partial file
+            temp_path = os.path.join(thumbnail_folder, f".{filename}.tmp")
+            resized.save(temp_path, format=THUMBNAIL_FORMAT.upper(), quality=THUMBNAIL_QUALITY, optimize=True)
+            os.replace(temp_path, os.path.join(thumbnail_folder, filename))
+            written.append(filename)
+
+    thumbnail_lookup.invalidate(os.path.basename(image_path))
+    return written
+
+def delete_thumbnail(filename, thumbnail_folder=THUMBNAIL_FOLDER):
+    """Remove the thumbnails for an uploaded image, if there are any."""
+    for width in THUMBNAIL_WIDTHS:
+        thumbnail_path = os.path.join(thumbnail_folder, thumbnail_name(filename, width))
+        if os.path.exists(thumbnail_path):
+            os.remove(thumbnail_path)
+    thumbnail_lookup.invalidate(filename)
+
+def thumbnail_url(filename):
+    """URL of an image's thumbnail, falling back to the original until one exists."""
+    if filename and thumbnail_lookup.present(filename, (THUMBNAIL_WIDTH,)):
+        return url_for('thumbnail_file', filename=thumbnail_name(filename))
+    return url_for('uploaded_file', filename=filename)
+
+def thumbnail_prefix():
+    """URL prefix of the thumbnail route, built once per request.
+
+    Thumbnail names need no URL quoting, so listing pages append them to the
+    prefix instead of calling url_for for every image and width.
+    """
+    if 'thumbnail_prefix' not in g:
+        g.thumbnail_prefix = url_for('thumbnail_file', filename='_')[:-1]
+    return g.thumbnail_prefix
+
+def thumbnail_image(question, max_height):
+    """(src, srcset, width, height) for a question's <img> on a listing page.
+
+    src is the THUMBNAIL_WIDTH thumbnail, falling back to the original until it
+    exists; srcset lists every width that exists (per thumbnail_lookup, so the
+    render loop doesn't touch the disk), and is '' while the image's
+    size is unknown. width/height are the size the image is shown at when scaled
+    down to max_height (None if unknown), so the browser can reserve its box
+    before the lazily loaded file arrives.
+    """
+    filename = question['image_path']
+    image_width, image_height = question.get('image_width'), question.get('image_height')
+    width = height = None
+    if image_width and image_height:
+        scale = min(1, max_height / image_height)
+        width, height = round(image_width * scale), round(image_height * scale)
+
+    sizes = thumbnail_widths(image_width) if image_width else [THUMBNAIL_WIDTH]
+    present = thumbnail_lookup.present(filename, sizes) if filename else ()
+    if THUMBNAIL_WIDTH not in present:
+        return url_for('uploaded_file', filename=filename), '', width, height
+
+    prefix = thumbnail_prefix()
+    srcset = ''
+    if image_width:
+        # A thumbnail of an image narrower than its nominal width is only as wide as the image
+        srcset = ', '.join(f"{prefix}{thumbnail_name(filename, size)} {min(size, image_width)}w" for size in present)
+    return prefix + thumbnail_name(filename), srcset, width, height
+
+def init_thumbnails(app):
+    """Register the thumbnail route and the thumbnail_url/thumbnail_image template helpers on an app."""
+    def thumbnail_file(filename):
+        """Serve generated thumbnails."""
+        return send_upload(THUMBNAIL_FOLDER, filename, immutable=False, max_age=THUMBNAIL_CACHE_MAX_AGE)
+
+    app.add_url_rule('/thumbnails/<filename>', 'thumbnail_file', thumbnail_file)
+    app.add_template_global(thumbnail_url)
+    app.add_template_global(thumbnail_image)
+
+def backfill_thumbnails(upload_folder=UPLOAD_FOLDER, thumbnail_folder=THUMBNAIL_FOLDER, force=False):
+    """Create missing thumbnails (at every width) for every image in upload_folder."""
+    created = skipped = failed = 0
+
+    for filename in sorted(os.listdir(upload_folder)):
+        image_path = os.path.join(upload_folder, filename)
+        if not os.path.isfile(image_path) or filename.rsplit('.', 1)[-1].lower() not in IMAGE_EXTENSIONS:
+            continue
+
+        try:
+            if create_thumbnails(image_path, thumbnail_folder, skip_existing=not force):
+                created += 1
+            else:
+                skipped += 1
+        except Exception as e:
+            print(f"  ❌ Could not thumbnail {filename}: {e}")
+            failed += 1
+
+    print(f"✅ Created thumbnails for {created} images ({skipped} already complete, {failed} failed)")
+    return failed == 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate thumbnails for existing Quiz Partner uploads')
+    parser.add_argument('--uploads', default=UPLOAD_FOLDER, help='Uploads directory (default: uploads)')
+    parser.add_argument('--force', action='store_true', help='Regenerate thumbnails that already exist')
+
+    args = parser.parse_args()
+
+    print("🖼️ Quiz Partner - Thumbnail Backfill")
+    print("=" * 60)
+
+    thumbnail_folder = os.path.join(args.uploads, 'thumbnails')
+    success = backfill_thumbnails(args.uploads, thumbnail_folder, force=args.force)
+    sys.exit(0 if success else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+"""
+Storage and serving helpers for uploaded question images
+Uploads are stored under the SHA-256 of their content, so the same screenshot
+pasted into several questions is kept once. Files are never modified after they
+are written, so responses can be cached by browsers and proxies indefinitely.
+
+Set UPLOAD_SENDFILE_MODE to hand the file transfer to a front proxy instead of
+the gunicorn worker:
+  x-accel     nginx, with an internal location mapping UPLOAD_ACCEL_PREFIX to uploads/
+              e.g.  location /internal-uploads/ { internal; alias /app/uploads/; }
+  x-sendfile  Apache mod_xsendfile / lighttpd
+"""
+
+import os
+import re
+import time
+import uuid
+import queue
+import atexit
+import hashlib
+import threading
+import mimetypes
+from flask import abort, current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+# Configuration
+UPLOAD_FOLDER = 'uploads'
+UPLOAD_CACHE_MAX_AGE = int(os.environ.get('UPLOAD_CACHE_MAX_AGE', str(365 * 24 * 60 * 60)))
+UPLOAD_SENDFILE_MODE = os.environ.get('UPLOAD_SENDFILE_MODE', '').lower()
+UPLOAD_ACCEL_PREFIX = os.environ.get('UPLOAD_ACCEL_PREFIX', '/internal-uploads/')
+HASH_CHUNK_SIZE = 64 * 1024
+CONTENT_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+# Names written by store_upload(): content hash plus extension
+STORED_UPLOAD_PATTERN = re.compile(r'^[0-9a-f]{64}\.[0-9a-z]+$')
+REAPER_BATCH_SIZE = int(os.environ.get('REAPER_BATCH_SIZE', '100'))
+REAPER_MAX_ATTEMPTS = int(os.environ.get('REAPER_MAX_ATTEMPTS', '5'))
+REAPER_RETRY_DELAY = float(os.environ.get('REAPER_RETRY_DELAY', '5'))
+# Periodic sweep for unreferenced files whose queued deletion was lost (off by default)
+REAPER_SWEEP_INTERVAL = float(os.environ.get('REAPER_SWEEP_INTERVAL', '0'))
+REAPER_SWEEP_MIN_AGE = float(os.environ.get('REAPER_SWEEP_MIN_AGE', '3600'))
+
+# Extensions that name the same format are stored under one spelling
+EXTENSION_ALIASES = {'jpeg': 'jpg'}
+
+def file_sha256(path):
+    """SHA-256 hex digest of a file, read in chunks."""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def store_upload(file, upload_folder, extension):
+    """Save an uploaded file under its content hash.
+
+    Returns (filename, created); created is False when identical content was
+    already stored, in which case nothing is written. The existing file may be
+    in the middle of being reaped, so call restore_upload() once the question
+    using it is saved.
+    """
+    hasher = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+        hasher.update(chunk)
+    file.seek(0)
+
+    extension = extension.lower()
+    filename = f"{hasher.hexdigest()}.{EXTENSION_ALIASES.get(extension, extension)}"
+    file_path = os.path.join(upload_folder, filename)
+    if os.path.exists(file_path):
+        return filename, False
+
+    # Write to a temporary name first so a concurrent upload never sees a partial file
+    temp_path = os.path.join(upload_folder, f".{uuid.uuid4()}.tmp")
+    file.save(temp_path)
+    os.replace(temp_path, file_path)
+    return filename, True
+
+def restore_upload(file, upload_folder, filename):
+    """Write an upload back if it was deleted after store_upload() deduplicated it.
+
+    Call this once the question referencing filename is saved: from then on
+    delete_upload() sees the reference, so the file can't disappear again.
+    Returns True if the file had to be rewritten.
+    """
+    file_path = os.path.join(upload_folder, filename)
+    if os.path.exists(file_path):
+        return False
+
+    file.seek(0)
+    temp_path = os.path.join(upload_folder, f".{uuid.uuid4()}.tmp")
+    file.save(temp_path)
+    os.replace(temp_path, file_path)
+    return True
+
+def delete_upload(upload_folder, filename, is_referenced):
+    """Delete an upload unless a question references it by the time it is gone.
+
+    The file is first moved aside, so a concurrent upload of the same content
+    either deduplicated against it before the move (and its question is seen
+    by the is_referenced(filename) re-check, which puts the file back) or finds
+    it missing and restores it. Returns True if the file was deleted.
+    """
+    file_path = os.path.join(upload_folder, filename)
+    reaped_path = os.path.join(upload_folder, f".{filename}.{uuid.uuid4()}.reaped")
+    try:
+        os.replace(file_path, reaped_path)
+    except FileNotFoundError:
+        return False
+
+    if is_referenced(filename):
+        os.replace(reaped_path, file_path)
+        return False
+    os.remove(reaped_path)
+    return True
+
+def list_stale_uploads(upload_folder, min_age=REAPER_SWEEP_MIN_AGE):
+    """Names of stored uploads older than min_age, for the reaper's periodic sweep.
+
+    Only content-hash names written by store_upload() are listed; anything else
+    in the folder (e.g. files of the legacy apps) is left alone. Younger files
+    are skipped, as an upload is stored just before the question that
+    references it. Leftovers of interrupted writes and deletions are tidied on
+    the way: temporary files are removed, and files moved aside by
+    delete_upload() are put back to be checked like the rest.
+    """
+    cutoff = time.time() - min_age
+    names = []
+    with os.scandir(upload_folder) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.stat().st_mtime > cutoff:
+                continue
+            try:
+                if STORED_UPLOAD_PATTERN.match(entry.name):
+                    names.append(entry.name)
+                elif entry.name.startswith('.') and entry.name.endswith('.tmp'):
+                    os.remove(entry.path)
+                elif entry.name.startswith('.') and entry.name.endswith('.reaped'):
+                    filename = entry.name[1:].rsplit('.', 2)[0]
+                    if STORED_UPLOAD_PATTERN.match(filename):
+                        os.replace(entry.path, os.path.join(upload_folder, filename))
+                        names.append(filename)
+            except OSError as e:
+                print(f"⚠️ Warning: File reaper could not tidy {entry.name}: {e}")
+    return names
+
+def send_upload(folder, filename, immutable=True, max_age=UPLOAD_CACHE_MAX_AGE):
+    """Serve a file from an upload folder with long-lived, immutable caching.
+
+    Served directly, the response carries a strong ETag (the unique filename)
+    and supports If-None-Match / 304 and byte ranges. In a proxy mode only the
+    headers are produced and the proxy streams the bytes.
+
+    Derived files that can be rewritten under the same name (thumbnails) pass
+    immutable=False: their ETag comes from the file's mtime and size instead,
+    and caches revalidate them once max_age has passed.
+    """
+    if UPLOAD_SENDFILE_MODE in ('x-accel', 'x-sendfile'):
+        response = send_via_proxy(folder, filename, immutable)
+    else:
+        response = send_from_directory(folder, filename, max_age=max_age, etag=filename if immutable else True)
+
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.immutable = immutable
+    return response
+
+def send_via_proxy(folder, filename, immutable=True):
+    """Build an empty response telling the front proxy which file to send."""
+    upload_root = os.path.join(current_app.root_path, UPLOAD_FOLDER)
+    path = safe_join(os.path.join(current_app.root_path, folder), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    response = current_app.response_class(
+        mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    )
+    if UPLOAD_SENDFILE_MODE == 'x-accel':
+        relative_path = os.path.relpath(path, upload_root).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = UPLOAD_ACCEL_PREFIX.rstrip('/') + '/' + relative_path
+    else:
+        response.headers['X-Sendfile'] = path
+    if immutable:
+        response.set_etag(filename)
+    else:
+        stat = os.stat(path)
+        response.set_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+    return response.make_conditional(request)
+
+class FileReaper:
+    """Background worker that deletes upload files once nothing references them.
+
+    Requests enqueue candidate filenames and return immediately. The worker
+    thread drains the queue in batches, asks find_referenced() which of a
+    batch are still in use (one query per batch), calls delete_file() for the
+    rest and retries failures with a delay. The thread is started lazily in
+    each process, so it is safe with gunicorn's preload_app + fork.
+
+    The queue lives in memory, so deletions queued by a worker that is killed
+    are lost. If sweep_interval is set, the thread also queues whatever
+    list_files() returns (every stored file) once per interval, starting one
+    interval after it starts, so those are reaped eventually. Without it only
+    queued names are ever deleted.
+    """
+
+    def __init__(self, find_referenced, delete_file, batch_size=REAPER_BATCH_SIZE,
+                 max_attempts=REAPER_MAX_ATTEMPTS, retry_delay=REAPER_RETRY_DELAY,
+                 list_files=None, sweep_interval=REAPER_SWEEP_INTERVAL):
+        self.find_referenced = find_referenced
+        self.delete_file = delete_file
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.list_files = list_files
+        self.sweep_interval = sweep_interval
+        self._queue = queue.Queue()
+        self._retries = []
+        self._retries_lock = threading.Lock()
+        self._next_sweep = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.drain)
+
+    def enqueue(self, filenames):
+        """Schedule files for deletion if they end up unreferenced."""
+        for filename in set(filenames):
+            self._queue.put((filename, 1))
+        self._ensure_started()
+
+    def start(self):
+        """Start the worker thread now (in each gunicorn worker), so sweeps run without deletes.
+
+        Does nothing unless sweeps are enabled.
+        """
+        if self.list_files is None or self.sweep_interval <= 0:
+            return
+        self._ensure_started()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                # The first sweep waits a full interval, so restarting workers never sweeps
+                self._next_sweep = time.monotonic() + self.sweep_interval
+                self._thread = threading.Thread(target=self._run, name='file-reaper', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._sweep_if_due()
+            self._requeue_due_retries()
+            try:
+                batch = [self._queue.get(timeout=self.retry_delay)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _sweep_if_due(self):
+        if self.list_files is None or self.sweep_interval <= 0 or time.monotonic() < self._next_sweep:
+            return
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        try:
+            filenames = self.list_files()
+        except OSError as e:
+            print(f"⚠️ Warning: File reaper could not list files to sweep: {e}")
+            return
+        # A single attempt each: failures are picked up again by the next sweep
+        for filename in filenames:
+            self._queue.put((filename, self.max_attempts))
+
+    def _requeue_due_retries(self):
+        now = time.monotonic()
+        with self._retries_lock:
+            due = [item for item in self._retries if item[0] <= now]
+            self._retries = [item for item in self._retries if item[0] > now]
+        for _, filename, attempt in due:
+            self._queue.put((filename, attempt))
+
+    def _process(self, batch):
+        attempts = {}
+        for filename, attempt in batch:
+            attempts[filename] = max(attempt, attempts.get(filename, 0))
+
+        try:
+            referenced = set(self.find_referenced(list(attempts)))
+        except Exception as e:
+            print(f"⚠️ Warning: File reaper could not check references: {e}")
+            for filename, attempt in attempts.items():
+                self._retry(filename, attempt)
+            return
+
+        for filename, attempt in attempts.items():
+            if filename in referenced:
+                continue
+            try:
+                self.delete_file(filename)
+            except OSError as e:
+                print(f"⚠️ Warning: File reaper could not delete {filename}: {e}")
+                self._retry(filename, attempt)
+
+    def _retry(self, filename, attempt):
+        if attempt >= self.max_attempts:
+            print(f"❌ File reaper gave up on {filename} after {attempt} attempts")
+            return
+        with self._retries_lock:
+            self._retries.append((time.monotonic() + self.retry_delay, filename, attempt + 1))
+
+    def drain(self):
+        """Process everything still queued in the calling thread (used at exit)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        with self._retries_lock:
+            batch.extend((filename, attempt) for _, filename, attempt in self._retries)
+            self._retries = []
+        if batch:
+            self._process(batch)